@@ -1,13 +1,34 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Form, BackgroundTasks, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+import itertools
 import os
 import time
 
-from backend.orchestrator import run_pipeline
-from backend.compare.registry import load_results
-from backend.system_stats import send_system_info, send_system_stats
-from backend.upload import upload_dataset
+import pandas as pd
+
+from backend.orchestrator import run_pipeline, submit_pipeline
+from backend.jobs import scheduler
+from backend.engines import available_engines
+from backend import config
+from backend.compare.registry import (
+    best_per_metric, dataset_ranking, engine_rankings, find_run, latest_key, query_results,
+    results_version,
+)
+from backend.system_stats import get_system_info
+from backend.telemetry import choose_encoding, open_channel
+from backend.upload import UploadLimit, upload_dataset, DATASET_DIR
+from backend.dataset_cache import build_cache
+from backend.profiler import load_profile
+from backend.artifacts import model_cache, profile_path, read_batches, predict_batch, valid_run_id
+from backend.tracing import top_functions
+from backend import monitoring
+from backend.responses import (
+    MAX_PAGE, cached_json, dumps, json_array, page, parse_cursor, parse_fields, parse_time
+)
 
 app = FastAPI(title="AutoML Laboratory")
 
@@ -19,16 +40,61 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# result history compresses well; small responses are not worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# oversized uploads are refused before their body is parsed
+app.add_middleware(UploadLimit)
+
+
+# -------------------- METRICS --------------------
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # route template, so /runs/{run_id}/profile is one series
+        route = request.scope.get("route")
+        monitoring.REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+        monitoring.record_process()
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition, summed over every API and job worker
+    """
+    body, content_type = monitoring.exposition()
+    return Response(content=body, media_type=content_type)
 
 # -------------------- MODELS --------------------
 class RunRequest(BaseModel):
     dataset: str
     tool: str
+    force: bool = False
+    # "race" or "progressive" when several tools are given
+    mode: str = "race"
+    # save a cProfile of every engine fit (implies force)
+    profile: bool = False
 
 
 class CompareRequest(BaseModel):
     dataset: str
     tool: str
+    # same filters / projection / paging (of "others") as GET /compare
+    fields: Optional[str] = None
+    task: Optional[str] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 
 # -------------------- ROUTES --------------------
@@ -45,13 +111,110 @@ def list_files():
     return {"files": files}
 
 
+@app.get("/engines")
+def list_engines():
+    """
+    Supported engines and whether their framework is installed
+    """
+    return {"engines": available_engines()}
+
+
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Upload a CSV dataset
-    Endpoint for file upload
+    Endpoint for file upload; the columnar cache is built after responding
     """
-    return await upload_dataset(file)
+    result = await upload_dataset(file)
+    profile = result["profile"] or {"columns": []}
+    dtypes = {c["name"]: c["dtype"] for c in profile["columns"]}
+    background_tasks.add_task(build_cache, os.path.join(DATASET_DIR, result["filename"]), dtypes)
+    return result
+
+
+@app.post("/predict")
+def predict(run_id: str = Form(...), file: UploadFile = File(...)):
+    """
+    Score a CSV/Parquet batch with a run's saved model.
+    The file is read and scored chunk by chunk; predictions stream back as CSV
+    """
+    try:
+        manifest, model = model_cache.get(run_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No saved model for run {run_id}")
+
+    batches = read_batches(file.file, file.filename or "")
+    try:
+        first = next(batches, None)
+        if first is None:
+            raise ValueError("Empty file")
+        first_preds = predict_batch(manifest, model, first)
+    except ValueError as e:
+        batches.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def stream():
+        preds = itertools.chain(
+            [first_preds], (predict_batch(manifest, model, df) for df in batches)
+        )
+        for i, chunk in enumerate(preds):
+            yield pd.DataFrame({"prediction": chunk}).to_csv(index=False, header=i == 0)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv",
+        headers={"X-Run-Id": run_id, "X-Engine": manifest["engine"]},
+    )
+
+
+@app.get("/models/cache")
+def models_cache():
+    """
+    Models currently loaded for /predict
+    """
+    return model_cache.stats()
+
+
+@app.get("/runs/{run_id}/profile")
+def run_profile(run_id: str, download: bool = False):
+    """
+    Stage timings of a run and, if it was profiled, its hottest functions
+    (download=true returns the raw .prof for snakeviz / pstats)
+    """
+    entry = find_run(run_id) if valid_run_id(run_id) else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    path = profile_path(run_id)
+    has_profile = os.path.exists(path)
+    if download:
+        if not has_profile:
+            raise HTTPException(status_code=404, detail="Run was not profiled")
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{run_id}.prof")
+
+    return {
+        "run_id": run_id,
+        "dataset": entry.get("dataset"),
+        "tool": entry.get("tool"),
+        "training_time_sec": entry.get("training_time_sec"),
+        "spans": entry.get("spans", []),
+        "top_functions": top_functions(path, config.PROFILE_TOP_FUNCTIONS) if has_profile else None,
+    }
+
+
+@app.get("/datasets/{filename}/profile")
+def dataset_profile(filename: str):
+    """
+    Profile captured while the dataset was uploaded
+    """
+    path = os.path.join(DATASET_DIR, os.path.basename(filename))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    profile = load_profile(path)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No up-to-date profile for dataset")
+    return profile
 
 
 @app.post("/run")
@@ -62,9 +225,14 @@ async def run_automl(req: RunRequest):
     """
     start_time = time.time()
     raw_result = None
-
-    async for msg in run_pipeline(req.dataset, req.tool):
-        if msg.get("type") == "result":
+    job_id = None
+
+    async for msg in run_pipeline(
+        req.dataset, req.tool, force=req.force, mode=req.mode, profile=req.profile
+    ):
+        if msg.get("type") == "job":
+            job_id = msg.get("job_id")
+        elif msg.get("type") == "result":
             raw_result = msg.get("data")
 
     if not raw_result:
@@ -90,6 +258,7 @@ async def run_automl(req: RunRequest):
 
     response = {
         "run_id": raw_result.get("run_id", f"{req.tool}-{int(start_time)}"),
+        "job_id": job_id,
         "dataset": req.dataset,
         "tool": req.tool,
         "status": "COMPLETED",
@@ -107,49 +276,128 @@ async def run_automl(req: RunRequest):
     return response
 
 
-@app.post("/compare")
-def compare(req: CompareRequest):
-    records = load_results()
-
-    # 🔹 CASE 1: wildcard → latest dataset group
-    if req.dataset == "*" and req.tool == "*":
-        if not records:
-            return {"selected": None, "others": []}
-
-        # latest entry = last saved
-        selected = records[-1]
-        dataset = selected.get("dataset")
-
-        others = [
-            r for r in records
-            if r.get("dataset") == dataset and r != selected
-        ]
-
-        return {
-            "selected": selected,
-            "others": others
-        }
-
-    # 🔹 CASE 2: normal comparison
-    filtered = [
-        r for r in records
-        if r.get("dataset") == req.dataset
-    ]
+@app.post("/jobs")
+async def submit_job(req: RunRequest):
+    """
+    Queue an AutoML run and return immediately with its job id
+    """
+    try:
+        job_id = await submit_pipeline(
+            req.dataset, req.tool, force=req.force, mode=req.mode, profile=req.profile
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    selected = None
-    others = []
+    return scheduler.get(job_id)
 
-    for r in filtered:
-        if r.get("tool") == req.tool:
-            selected = r
-        else:
-            others.append(r)
 
+@app.get("/jobs")
+def list_jobs():
     return {
-        "selected": selected,
-        "others": others
+        "slots": scheduler.slots,
+        "queue_depth": scheduler.queue_depth(),
+        "jobs": scheduler.list()
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Job status, queue position and (once completed) its result
+    """
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.on_event("shutdown")
+def shutdown_scheduler():
+    scheduler.shutdown()
+    monitoring.mark_dead()
+
+
+def _compare(request, dataset, tool, fields=None, task=None, since=None, until=None,
+             cursor=None, limit=None):
+    """
+    Latest result of `tool` on `dataset` against the other tools' latest
+    ones; "*" / "*" compares the newest result with its dataset group.
+    """
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE))
+    filters = {
+        "task": task,
+        "since": parse_time(since),
+        "until": parse_time(until),
+        "fields": parse_fields(fields),
     }
+    after_id = parse_cursor(cursor)
+
+    def build():
+        ds, tl = dataset, tool
+        if ds == "*" and tl == "*":
+            key = latest_key()
+            if key is None:
+                return dumps({"selected": None, "others": [], "best_per_metric": {}})
+            ds, tl = key
+
+        selected = query_results(ds, tool=tl, **filters)
+        others, next_cursor = page(
+            query_results(
+                ds, exclude_tool=tl, after_id=after_id,
+                limit=limit + 1 if limit else None, **filters
+            ),
+            limit,
+        )
+        return (
+            b'{"selected":' + (selected[0][1].encode() if selected else b"null")
+            + b',"others":' + json_array(text for _, text in others)
+            + b',"best_per_metric":' + dumps(best_per_metric(ds))
+            + b',"next_cursor":' + dumps(next_cursor) + b"}"
+        )
+
+    key = (results_version(), dataset, tool, filters, after_id, limit)
+    return cached_json(request, key, build)
+
 
+@app.post("/compare")
+def compare(req: CompareRequest, request: Request):
+    return _compare(
+        request, req.dataset, req.tool, req.fields, req.task, req.since, req.until,
+        req.cursor, req.limit
+    )
+
+
+@app.get("/compare")
+def compare_get(
+    request: Request,
+    dataset: str = "*",
+    tool: str = "*",
+    fields: Optional[str] = None,
+    task: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE),
+):
+    """
+    Cacheable form of POST /compare (ETag / If-None-Match)
+    """
+    return _compare(request, dataset, tool, fields, task, since, until, cursor, limit)
+
+
+@app.get("/rankings")
+def rankings(request: Request, dataset: Optional[str] = None):
+    """
+    Engines by average rank across datasets (wins, relative score,
+    time to score), or one dataset's ranking
+    """
+    def build():
+        if dataset is not None:
+            return dumps({"dataset": dataset, "ranking": dataset_ranking(dataset)})
+        return dumps({"engines": engine_rankings()})
+
+    return cached_json(request, (results_version(), "rankings", dataset), build)
 
 
 # -------------------- WEBSOCKET --------------------
@@ -157,7 +405,9 @@ def compare(req: CompareRequest):
 @app.websocket("/ws/automl")
 async def ws_automl(websocket: WebSocket):
     """
-    Live AutoML execution with logs + system stats
+    Live AutoML execution with logs + system stats.
+    Logs arrive batched in "logs" frames; send "encoding": "msgpack"
+    for binary frames instead of JSON text.
     """
     await websocket.accept()
 
@@ -165,36 +415,64 @@ async def ws_automl(websocket: WebSocket):
         payload = await websocket.receive_json()
         dataset = payload.get("filename")
         tool = payload.get("tool", "h2o")
+        force = bool(payload.get("force", False))
+        mode = payload.get("mode", "race")
+        profile = bool(payload.get("profile", False))
+        encoding = choose_encoding(payload.get("encoding", "json"))
 
         if not dataset:
             await websocket.close(code=1008)
             return
 
-        await send_system_info(websocket)
+        async with open_channel(websocket, encoding) as channel:
+            channel.send({"type": "system_info", "data": get_system_info()})
+            if encoding != payload.get("encoding", "json"):
+                channel.send({"type": "log", "message": "msgpack is not installed, sending JSON"})
 
-        async for msg in run_pipeline(dataset, tool):
-            if msg["type"] == "log":
-                await websocket.send_json(msg)
-                await send_system_stats(websocket)
+            async for msg in run_pipeline(dataset, tool, force=force, mode=mode, profile=profile):
+                channel.send(msg)
+                if msg["type"] == "result":
+                    break
 
-            elif msg["type"] == "result":
-                await websocket.send_json({
-                    "type": "result",
-                    "data": msg["data"]
-                })
-                await websocket.send_json({"type": "done"})
-                await websocket.close()
-                return
+            channel.send({"type": "done"})
 
-        await websocket.send_json({"type": "done"})
         await websocket.close()
 
     except WebSocketDisconnect:
         pass
 
 @app.get("/benchmarks")
-def get_benchmarks():
+def get_benchmarks(
+    request: Request,
+    dataset: Optional[str] = None,
+    tool: Optional[str] = None,
+    task: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE),
+):
     """
-    Return all saved benchmark results
+    Saved benchmark results (latest per dataset/tool, oldest first), a page
+    at a time: pass next_cursor back as cursor. since/until take a unix
+    timestamp or ISO date; fields=dataset,tool,metrics keeps only those keys.
     """
-    return load_results()
+    query = {
+        "dataset": dataset,
+        "tool": tool,
+        "task": task,
+        "since": parse_time(since),
+        "until": parse_time(until),
+        "fields": parse_fields(fields),
+        "after_id": parse_cursor(cursor),
+    }
+
+    def build():
+        rows, next_cursor = page(query_results(**query, limit=limit + 1), limit)
+        return (
+            b'{"results":' + json_array(text for _, text in rows)
+            + b',"next_cursor":' + dumps(next_cursor) + b"}"
+        )
+
+    return cached_json(request, (results_version(), query, limit), build)
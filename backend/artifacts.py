@@ -0,0 +1,206 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from backend import config
+from backend.compare.registry import STORAGE_DIR
+from backend.engines import runner_module
+from backend.preprocess import encode_features
+from .logger import setup_logger
+
+log = setup_logger("ARTIFACTS")
+
+MODELS_DIR = os.path.join(STORAGE_DIR, "models")
+PROFILES_DIR = os.path.join(STORAGE_DIR, "profiles")
+
+# engines trained on the encoded NumPy matrices; the rest take raw frames
+ENCODED_INPUT = ("tpot", "flaml")
+
+# what new_run_id() produces; ids from requests must match before they
+# are joined into a path (and the model under it unpickled)
+RUN_ID = re.compile(r"[0-9a-f]{16}")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def valid_run_id(run_id) -> bool:
+    return isinstance(run_id, str) and RUN_ID.fullmatch(run_id) is not None
+
+
+def _checked(run_id):
+    if not valid_run_id(run_id):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return run_id
+
+
+def profile_path(run_id: str) -> str:
+    return os.path.join(PROFILES_DIR, f"{_checked(run_id)}.prof")
+
+
+def artifact_dir(run_id: str) -> str:
+    return os.path.join(MODELS_DIR, _checked(run_id))
+
+
+def _dir_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def write_manifest(run_id, engine, dataset, best_model, prep):
+    """
+    Describe a saved model: which engine loads it and how raw rows must
+    be prepared before scoring. The preprocessing meta is copied in, so
+    the artifact outlives the dataset cache.
+    """
+    path = artifact_dir(run_id)
+    manifest = {
+        "run_id": run_id,
+        "engine": engine,
+        "dataset": dataset,
+        "best_model": best_model,
+        "task": prep.task,
+        "target": prep.target,
+        "input": "encoded" if engine in ENCODED_INPUT else "frame",
+        "prep": prep.meta,
+        "created": time.time(),
+    }
+    manifest["bytes"] = _dir_bytes(path)
+
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    return manifest
+
+
+def read_manifest(run_id: str):
+    if not valid_run_id(run_id):
+        return None
+    path = os.path.join(artifact_dir(run_id), "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def delete_artifacts(run_ids):
+    for run_id in run_ids:
+        if not valid_run_id(run_id):
+            continue
+        model_cache.discard(run_id)
+        shutil.rmtree(artifact_dir(run_id), ignore_errors=True)
+        if os.path.exists(profile_path(run_id)):
+            os.remove(profile_path(run_id))
+    log.info(f"Deleted artifacts of {len(run_ids)} runs")
+
+
+class ModelCache:
+    """
+    Loaded models for /predict, least recently used first out. Bounded
+    by the models' size on disk, a proxy for what they hold in memory.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, run_id):
+        """
+        (manifest, model) for a run, loading it on a miss.
+        Raises KeyError when the run has no saved model (or the id is
+        not a run id).
+        """
+        if not valid_run_id(run_id):
+            raise KeyError(run_id)
+
+        with self._lock:
+            if run_id in self._models:
+                self._models.move_to_end(run_id)
+                return self._models[run_id]
+
+        manifest = read_manifest(run_id)
+        if manifest is None:
+            raise KeyError(run_id)
+
+        start = time.perf_counter()
+        model = runner_module(manifest["engine"]).load_model(artifact_dir(run_id))
+        log.info(f"Loaded model {run_id} in {time.perf_counter() - start:.2f}s")
+
+        with self._lock:
+            if run_id not in self._models:
+                self._models[run_id] = (manifest, model)
+                self._bytes += manifest["bytes"]
+                self._evict()
+            return self._models.get(run_id, (manifest, model))
+
+    def discard(self, run_id):
+        with self._lock:
+            item = self._models.pop(run_id, None)
+            if item is not None:
+                self._bytes -= item[0]["bytes"]
+                self._unload(*item)
+
+    def _evict(self):
+        # the newest model always stays, even when larger than the bound
+        while self._bytes > self.max_bytes and len(self._models) > 1:
+            _, (manifest, model) = self._models.popitem(last=False)
+            self._bytes -= manifest["bytes"]
+            self._unload(manifest, model)
+
+    @staticmethod
+    def _unload(manifest, model):
+        unload = getattr(runner_module(manifest["engine"]), "unload_model", None)
+        if unload is not None:
+            unload(model)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": list(self._models),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+model_cache = ModelCache(config.MODEL_CACHE_BYTES)
+
+
+def read_batches(file, filename: str, chunk_rows: int = config.PREDICT_CHUNK_ROWS):
+    """
+    Yield a scoring file (CSV or Parquet) as DataFrames of chunk_rows rows.
+    """
+    if filename.lower().endswith(".parquet"):
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file, chunksize=chunk_rows)
+
+
+def predict_batch(manifest, model, df: pd.DataFrame):
+    """
+    Predictions for one batch of raw rows. Raises ValueError when
+    feature columns are missing.
+    """
+    features = manifest["prep"]["features"]
+    missing = [c for c in features if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    if manifest["input"] == "encoded":
+        X = encode_features(df, manifest["prep"])
+    else:
+        X = df[features]
+    return runner_module(manifest["engine"]).predict_model(model, X)
@@ -1,21 +1,68 @@
+import os
+
 from autogluon.tabular import TabularPredictor
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    mean_squared_error,
-    mean_absolute_error,
-    r2_score,
-    confusion_matrix,
-)
+from .leaderboard import evaluate_leaderboard
 from .logger import setup_logger
+from .tracing import span
+
+try:
+    # fit callbacks arrived in AutoGluon 1.2
+    from autogluon.core.callbacks import AbstractCallback
+except ImportError:
+    AbstractCallback = None
 
 log = setup_logger("AUTOGLUON")
 
 MIN_ROWS = 50
 
 
+def _progress_callback(on_progress):
+    """
+    Fit callback reporting each trained model and the best validation
+    score so far, or None when this AutoGluon has no callback API.
+    """
+    if AbstractCallback is None:
+        return None
+
+    class ProgressCallback(AbstractCallback):
+        def _before_model_fit(self, trainer, model, **kwargs):
+            return False, False
+
+        def _after_model_fit(self, trainer, model_names, **kwargs):
+            scores = {
+                name: score
+                for name, score in trainer.get_models_attribute_dict("val_score").items()
+                if score is not None
+            }
+            best = max(scores, key=scores.get) if scores else None
+            on_progress({
+                "models_trained": len(scores),
+                "best_score": round(float(scores[best]), 4) if best else None,
+                "score_name": "val_score",
+                "leader": best,
+            })
+            return False
+
+    return ProgressCallback()
+
+
+# AutoGluon's validation scores use these, so they compare with the
+# accuracy / rmse of the early-stop baseline
+EVAL_METRICS = {"classification": "accuracy", "regression": "root_mean_squared_error"}
+
+
+def _validation_score(predictor, task):
+    """
+    Validation score of the best model as accuracy / rmse (AutoGluon
+    reports errors negated, higher always better).
+    """
+    leaderboard = predictor.leaderboard(silent=True).set_index("model")
+    score = leaderboard["score_val"].get(predictor.model_best)
+    if score is None:
+        return None
+    return float(score) if task == "classification" else -float(score)
+
+
 def _map_problem_type(task, y):
     if task == "classification":
         return "binary" if len(set(y)) == 2 else "multiclass"
@@ -27,7 +74,11 @@ def run_autogluon(
     test_df,
     target: str,
     task: str,
-    time_limit: int = 60
+    time_limit: int = 60,
+    resources=None,
+    early_stop=None,
+    artifact_dir=None,
+    on_progress=None
 ):
     if train_df.shape[0] < MIN_ROWS:
         return {"skipped": True, "reason": "Dataset too small"}
@@ -38,66 +89,72 @@ def run_autogluon(
     predictor = TabularPredictor(
         label=target,
         problem_type=problem_type,
+        eval_metric=EVAL_METRICS[task],
+        path=os.path.join(artifact_dir, "predictor") if artifact_dir else None,
         verbosity=0
     )
 
+    num_cpus = resources["cpus"] if resources else "auto"
+    first, rest = early_stop.phases(time_limit) if early_stop else (time_limit, 0)
+
+    callback = _progress_callback(on_progress) if on_progress else None
     predictor.fit(
         train_data=train_df,
-        time_limit=time_limit,
-        presets="medium_quality_faster_train"
+        time_limit=first,
+        presets="medium_quality_faster_train",
+        num_cpus=num_cpus,
+        **({"callbacks": [callback]} if callback else {})
     )
 
+    stop_report = None
+    if early_stop:
+        interim = _validation_score(predictor, task)
+        stopped = early_stop.should_stop(interim)
+        stop_report = early_stop.report(time_limit, stopped, interim=interim)
+        if stopped:
+            log.info(f"AutoGluon did not beat the baseline, stopping after {first}s")
+        elif rest:
+            # adds models (and a refreshed ensemble) to the same predictor
+            predictor.fit_extra(hyperparameters="default", time_limit=rest, num_cpus=num_cpus)
+
     y_true = test_df[target].values
     X_test = test_df.drop(columns=[target])
 
-    model_names = predictor.model_names()
-    leaderboard = []
-
-    for model_name in model_names[:5]:
-        preds = predictor.predict(X_test, model=model_name)
-
-        if task == "classification":
-            acc = float(accuracy_score(y_true, preds))
-            prec = float(precision_score(y_true, preds, average="weighted", zero_division=0))
-            rec = float(recall_score(y_true, preds, average="weighted", zero_division=0))
-            f1 = float(f1_score(y_true, preds, average="weighted", zero_division=0))
-
-            leaderboard.append({
-                "model_id": model_name,
-                "accuracy": round(acc, 4),
-                "precision_weighted": round(prec, 4),
-                "recall_weighted": round(rec, 4),
-                "f1_weighted": round(f1, 4),
-            })
-        else:
-            rmse = float(mean_squared_error(y_true, preds, squared=False))
-            mae = float(mean_absolute_error(y_true, preds))
-            r2 = float(r2_score(y_true, preds))
-
-            leaderboard.append({
-                "model_id": model_name,
-                "rmse": round(rmse, 4),
-                "mae": round(mae, 4),
-                "r2": round(r2, 4),
-            })
-
-    confusion = None
-    best_model_id = leaderboard[0]["model_id"] if leaderboard else None
-
-    if task == "classification" and best_model_id:
-        best_preds = predictor.predict(X_test, model=best_model_id)
-        labels = sorted(set(y_true))
-        cm = confusion_matrix(y_true, best_preds, labels=labels)
+    # predict_multi shares base-model predictions with the stack
+    # ensembles built on them, so all top-k models score in one pass
+    def predict_many(models):
+        preds = predictor.predict_multi(X_test, models=models)
+        return {name: p.values for name, p in preds.items()}
+
+    # AutoGluon's leaderboard is sorted by validation score, so the top-k
+    # scored here are its k best models, not the first k trained
+    ranked = predictor.leaderboard(silent=True)["model"].tolist()
+    leaderboard, _, confusion = evaluate_leaderboard(
+        ranked, y_true, task, predict_many=predict_many
+    )
+    # AutoGluon's own pick (best validation score) is what gets saved
+    # and served by /predict
+    best_model_id = predictor.model_best if leaderboard else None
 
-        confusion = {
-            "labels": labels,
-            "matrix": cm.tolist()
-        }
+    if artifact_dir and best_model_id:
+        # keep only what the best model needs to predict
+        with span("persist"):
+            predictor.delete_models(models_to_keep="best", dry_run=False)
 
     return {
         "skipped": False,
         "best_model": best_model_id,
         "metrics": leaderboard[0] if leaderboard else {},
         "confusion_matrix": confusion,
-        "leaderboard": leaderboard
+        "leaderboard": leaderboard,
+        "validation_score": _validation_score(predictor, task),
+        "early_stop": stop_report
     }
+
+
+def load_model(artifact_dir):
+    return TabularPredictor.load(os.path.join(artifact_dir, "predictor"))
+
+
+def predict_model(model, X):
+    return model.predict(X).values
@@ -1,19 +1,87 @@
 from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.metrics import accuracy_score, mean_squared_error
+from backend import config
 from .logger import setup_logger
+from .metrics import higher_is_better
+from .splitter import split_indices
 import numpy as np
 
 log = setup_logger("BASELINE")
 
-def train_baseline(X_train, X_test, y_train, y_test, task: str):
+def train_baseline(X_train, y_train, task: str):
+    """
+    Fit on part of the training split and score on the rest, so neither
+    the baseline nor the early-stop decision ever sees the test split.
+    """
+    try:
+        fit_idx, val_idx = split_indices(y_train, task)
+    except ValueError:
+        # a class too rare to stratify
+        fit_idx, val_idx = split_indices(y_train, "regression")
+    X_fit, y_fit = X_train[fit_idx], y_train[fit_idx]
+    X_val, y_val = X_train[val_idx], y_train[val_idx]
+
     if task == "classification":
         model = LogisticRegression(max_iter=1000)
-        model.fit(X_train, y_train)
-        preds = model.predict(X_test)
-        return "accuracy", accuracy_score(y_test, preds)
+        model.fit(X_fit, y_fit)
+        preds = model.predict(X_val)
+        return "accuracy", accuracy_score(y_val, preds)
 
     model = LinearRegression()
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
-    rmse = np.sqrt(mean_squared_error(y_test, preds))
+    model.fit(X_fit, y_fit)
+    preds = model.predict(X_val)
+    rmse = np.sqrt(mean_squared_error(y_val, preds))
     return "rmse", rmse
+
+
+class EarlyStop:
+    """
+    Early-stop rule handed to the runners. An engine trains for
+    `fraction` of its budget first; unless its leader then beats the
+    baseline by `margin` (relative), the rest of the budget is skipped.
+    The leader is judged on the engine's own validation score (CV or
+    holdout inside the training split), never on the test split.
+    """
+
+    def __init__(self, metric, baseline, margin=config.EARLY_STOP_MARGIN,
+                 fraction=config.EARLY_STOP_FRACTION):
+        self.metric = metric
+        self.baseline = baseline
+        self.margin = margin
+        self.fraction = fraction
+
+    @property
+    def higher_is_better(self):
+        return higher_is_better(self.metric)
+
+    def phases(self, time_limit):
+        """
+        (first, rest) split of a budget in whole seconds.
+        """
+        first = max(1, int(time_limit * self.fraction))
+        return first, max(0, time_limit - first)
+
+    def beats_baseline(self, score) -> bool:
+        if self.higher_is_better:
+            return score >= self.baseline * (1 + self.margin)
+        return score <= self.baseline * (1 - self.margin)
+
+    def should_stop(self, score) -> bool:
+        """
+        Without a validation score there is nothing to judge, so the
+        engine keeps its budget.
+        """
+        return score is not None and not self.beats_baseline(score)
+
+    def report(self, time_limit, stopped: bool, interim=None):
+        _, rest = self.phases(time_limit)
+        return {
+            "metric": self.metric,
+            "baseline": round(float(self.baseline), 4),
+            "margin": self.margin,
+            "checked_at_sec": time_limit - rest,
+            "interim": round(float(interim), 4) if interim is not None else None,
+            "interim_source": "validation",
+            "stopped_early": stopped,
+            "budget_saved_sec": rest if stopped else 0,
+        }
@@ -1,40 +1,629 @@
 import json
 import os
-from threading import Lock
+import sqlite3
+import threading
+import time
 
-STORE_PATH = "backend/storage/results.json"
-_lock = Lock()
+from backend.metrics import higher_is_better, primary_metric
+from backend.monitoring import REGISTRY_SECONDS, timed
 
-os.makedirs("backend/storage", exist_ok=True)
+STORAGE_DIR = "backend/storage"
+DB_PATH = os.path.join(STORAGE_DIR, "results.db")
+LEGACY_STORE_PATH = os.path.join(STORAGE_DIR, "results.json")
 
-def load_results():
-    if not os.path.exists(STORE_PATH):
-        return []
-    with open(STORE_PATH, "r") as f:
-        return json.load(f)
+os.makedirs(STORAGE_DIR, exist_ok=True)
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset   TEXT NOT NULL,
+    tool      TEXT NOT NULL,
+    task      TEXT,
+    timestamp REAL NOT NULL,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_dataset_tool_ts
+    ON results (dataset, tool, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_run_id
+    ON results (json_extract(data, '$.run_id'));
+CREATE TABLE IF NOT EXISTS memo (
+    fingerprint TEXT PRIMARY KEY,
+    result_id   INTEGER NOT NULL,
+    created     REAL NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memo_last_used ON memo (last_used);
+CREATE TABLE IF NOT EXISTS flaml_configs (
+    dataset  TEXT NOT NULL,
+    task     TEXT NOT NULL,
+    features TEXT NOT NULL,
+    configs  TEXT NOT NULL,
+    score    REAL,
+    created  REAL NOT NULL,
+    PRIMARY KEY (dataset, task)
+);
+CREATE TABLE IF NOT EXISTS latest_results (
+    dataset           TEXT NOT NULL,
+    tool              TEXT NOT NULL,
+    result_id         INTEGER NOT NULL,
+    task              TEXT,
+    metrics           TEXT NOT NULL,
+    best_model        TEXT,
+    time_to_score_sec REAL,
+    PRIMARY KEY (dataset, tool)
+);
+CREATE TABLE IF NOT EXISTS best_metrics (
+    dataset TEXT NOT NULL,
+    metric  TEXT NOT NULL,
+    tool    TEXT NOT NULL,
+    value   REAL NOT NULL,
+    model   TEXT,
+    PRIMARY KEY (dataset, metric)
+);
+CREATE TABLE IF NOT EXISTS dataset_ranks (
+    dataset           TEXT NOT NULL,
+    tool              TEXT NOT NULL,
+    metric            TEXT NOT NULL,
+    rank              REAL NOT NULL,
+    win               INTEGER NOT NULL,
+    relative_score    REAL,
+    time_to_score_sec REAL,
+    PRIMARY KEY (dataset, tool)
+);
+CREATE TABLE IF NOT EXISTS engine_stats (
+    tool                   TEXT PRIMARY KEY,
+    datasets               INTEGER NOT NULL,
+    rank_sum               REAL NOT NULL,
+    wins                   INTEGER NOT NULL,
+    relative_score_sum     REAL NOT NULL,
+    time_to_score_sum      REAL NOT NULL,
+    timed_datasets         INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# one connection per thread (and per process); WAL lets readers in
+# every uvicorn worker proceed while a single writer appends
+_local = threading.local()
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _migrate_legacy_json(conn)
+        _backfill_aggregates(conn)
+        _local.conn = conn
+    return conn
+
+
+def _insert(conn, entry, timestamp):
+    return conn.execute(
+        "INSERT INTO results (dataset, tool, task, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+        (
+            entry.get("dataset"),
+            entry.get("tool"),
+            entry.get("task"),
+            timestamp,
+            json.dumps(entry),
+        ),
+    ).lastrowid
+
+
+def _migrate_legacy_json(conn):
+    """
+    One-time import of the old results.json store. Guarded by a meta
+    flag inside a write transaction so concurrent workers import once.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = conn.execute(
+            "SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'"
+        ).fetchone()
+
+        if not done:
+            if os.path.exists(LEGACY_STORE_PATH):
+                with open(LEGACY_STORE_PATH, "r") as f:
+                    records = json.load(f)
+                mtime = os.path.getmtime(LEGACY_STORE_PATH)
+                for r in records:
+                    _insert(conn, r, r.get("timestamp", mtime))
+
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                (str(time.time()),),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _latest_filter(dataset=None, tool=None):
+    """
+    WHERE clause selecting the latest result per (dataset, tool).
+    """
+    where, params = [], []
+    if dataset is not None:
+        where.append("dataset = ?")
+        params.append(dataset)
+    if tool is not None:
+        where.append("tool = ?")
+        params.append(tool)
+
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    return (
+        f"id IN (SELECT MAX(id) FROM results {clause} GROUP BY dataset, tool)",
+        params,
+    )
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def load_results(dataset=None, tool=None):
+    """
+    Latest result per (dataset, tool), oldest first.
+    """
+    latest, params = _latest_filter(dataset, tool)
+    rows = _connect().execute(
+        f"SELECT data FROM results WHERE {latest} ORDER BY id", params
+    ).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def query_results(dataset=None, tool=None, exclude_tool=None, task=None, since=None,
+                  until=None, fields=None, after_id=None, limit=None):
+    """
+    Like load_results, but filtered, projected and paged in SQL and
+    returned as [(id, json_text)] so callers can serve the stored JSON
+    without decoding it. `fields` are (dotted) keys of the entry to keep;
+    pages continue after `after_id`.
+    """
+    latest, params = _latest_filter(dataset, tool)
+    where = [latest]
+    for clause, value in (
+        ("tool != ?", exclude_tool),
+        ("task = ?", task),
+        ("timestamp >= ?", since),
+        ("timestamp < ?", until),
+        ("id > ?", after_id),
+    ):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+
+    column = "data"
+    if fields:
+        # json_extract keeps nested objects as JSON inside json_object
+        column = f"json_object({', '.join(['?, json_extract(data, ?)'] * len(fields))})"
+        params = [v for f in fields for v in (f, f"$.{f}")] + params
+
+    sql = f"SELECT id, {column} FROM results WHERE {' AND '.join(where)} ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return _connect().execute(sql, params).fetchall()
+
+
+def results_version():
+    """
+    Changes whenever results are added or deleted (rows are never updated).
+    """
+    return _connect().execute("SELECT MAX(id), COUNT(*) FROM results").fetchone()
+
+
+def latest_key():
+    """
+    (dataset, tool) of the newest result, or None.
+    """
+    return _connect().execute(
+        "SELECT dataset, tool FROM results ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def find_run(run_id):
+    row = _connect().execute(
+        "SELECT data FROM results WHERE json_extract(data, '$.run_id') = ? "
+        "ORDER BY id DESC LIMIT 1",
+        (run_id,),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+@timed(REGISTRY_SECONDS, op="write")
 def save_result(entry):
-    with _lock:
-        data = load_results()
-
-        dataset = entry.get("dataset")
-        tool = entry.get("tool")
-
-        # FIX: ensure model id always exists
-        if not entry.get("best_model"):
-            lb = entry.get("leaderboard", [])
-            if lb and isinstance(lb, list) and "model_id" in lb[0]:
-                entry["best_model"] = lb[0]["model_id"]
-            else:
-                entry["best_model"] = "UNKNOWN_MODEL"
-
-        # remove old record for same dataset + tool
-        data = [
-            r for r in data
-            if not (r.get("dataset") == dataset and r.get("tool") == tool)
-        ]
-
-        data.append(entry)
-
-        with open(STORE_PATH, "w") as f:
-            json.dump(data, f, indent=2)
+    # FIX: ensure model id always exists
+    if not entry.get("best_model"):
+        lb = entry.get("leaderboard", [])
+        if lb and isinstance(lb, list) and "model_id" in lb[0]:
+            entry["best_model"] = lb[0]["model_id"]
+        else:
+            entry["best_model"] = "UNKNOWN_MODEL"
+
+    entry.setdefault("timestamp", time.time())
+
+    # older records for the same dataset + tool stay as history;
+    # load_results only returns the newest one
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result_id = _insert(conn, entry, entry["timestamp"])
+        _update_aggregates(conn, result_id, entry)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return result_id
+
+
+# -------------------- AGGREGATES --------------------
+# Materialized over the latest result per (dataset, tool), the set every
+# comparison view shows. Each save only recomputes its own dataset (one
+# row per engine) and moves that dataset's contribution in engine_stats,
+# so views cost the same however many runs are stored. Older results of
+# a pair are never the latest again, so deleting them needs no update.
+
+# bump when the aggregated values change meaning; the next connection
+# rebuilds every aggregate table from the stored results
+AGGREGATES_KEY = "aggregates_built_v2"
+
+
+def _numeric(metrics):
+    return {
+        k: v for k, v in (metrics or {}).items()
+        if isinstance(v, (int, float)) and not isinstance(v, bool)
+    }
+
+
+def _better(metric, a, b):
+    return a > b if higher_is_better(metric) else a < b
+
+
+def _relative(metric, score, best):
+    """
+    Score as a share of the dataset's best (1.0 = best engine).
+    """
+    if score == best:
+        return 1.0
+    if higher_is_better(metric):
+        return score / best if best > 0 else None
+    return best / score if score > 0 else None
+
+
+def _ranks(metric, scores):
+    """
+    Competition ranks by `metric`; tied engines share their average rank.
+    """
+    ordered = sorted(scores, key=scores.get, reverse=higher_is_better(metric))
+    ranks, i = {}, 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and scores[ordered[j + 1]] == scores[ordered[i]]:
+            j += 1
+        for tool in ordered[i:j + 1]:
+            ranks[tool] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+
+def _bump_engine(conn, tool, sign, rank, win, relative_score, time_to_score_sec):
+    timed_in = time_to_score_sec is not None
+    conn.execute(
+        """
+        INSERT INTO engine_stats (tool, datasets, rank_sum, wins, relative_score_sum,
+                                  time_to_score_sum, timed_datasets)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (tool) DO UPDATE SET
+            datasets = datasets + excluded.datasets,
+            rank_sum = rank_sum + excluded.rank_sum,
+            wins = wins + excluded.wins,
+            relative_score_sum = relative_score_sum + excluded.relative_score_sum,
+            time_to_score_sum = time_to_score_sum + excluded.time_to_score_sum,
+            timed_datasets = timed_datasets + excluded.timed_datasets
+        """,
+        (
+            tool, sign, sign * rank, sign * win, sign * (relative_score or 0.0),
+            sign * (time_to_score_sec or 0.0), sign * timed_in,
+        ),
+    )
+
+
+def _update_aggregates(conn, result_id, entry):
+    """
+    Fold a newly saved result into the aggregates (inside its transaction).
+    """
+    dataset, tool = entry.get("dataset"), entry.get("tool")
+    # total training time for every engine: only FLAML reports when it
+    # found its best model, and mixing the two would favour it
+    time_to_score = entry.get("training_time_sec")
+
+    conn.execute(
+        "INSERT OR REPLACE INTO latest_results "
+        "(dataset, tool, result_id, task, metrics, best_model, time_to_score_sec) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            dataset, tool, result_id, entry.get("task"),
+            json.dumps(_numeric(entry.get("metrics"))), entry.get("best_model"), time_to_score,
+        ),
+    )
+    rows = [
+        (t, task, json.loads(m), model, tts)
+        for t, task, m, model, tts in conn.execute(
+            "SELECT tool, task, metrics, best_model, time_to_score_sec "
+            "FROM latest_results WHERE dataset = ?",
+            (dataset,),
+        )
+    ]
+
+    best = {}
+    for t, _, metrics, model, _ in rows:
+        for metric, value in metrics.items():
+            if metric not in best or _better(metric, value, best[metric][1]):
+                best[metric] = (t, value, model)
+    conn.execute("DELETE FROM best_metrics WHERE dataset = ?", (dataset,))
+    conn.executemany(
+        "INSERT INTO best_metrics (dataset, metric, tool, value, model) VALUES (?, ?, ?, ?, ?)",
+        [(dataset, metric, t, value, model) for metric, (t, value, model) in best.items()],
+    )
+
+    # swap this dataset's old ranking for the new one in engine_stats
+    for old in conn.execute(
+        "SELECT tool, rank, win, relative_score, time_to_score_sec "
+        "FROM dataset_ranks WHERE dataset = ?",
+        (dataset,),
+    ).fetchall():
+        _bump_engine(conn, old[0], -1, *old[1:])
+    conn.execute("DELETE FROM dataset_ranks WHERE dataset = ?", (dataset,))
+
+    metric = primary_metric(entry.get("task"))
+    scores = {t: metrics[metric] for t, _, metrics, _, _ in rows if metric in metrics}
+    if not scores:
+        return
+    times = {t: tts for t, _, _, _, tts in rows}
+    for t, rank in _ranks(metric, scores).items():
+        ranked = (
+            rank, int(rank == 1), _relative(metric, scores[t], best[metric][1]), times[t]
+        )
+        conn.execute(
+            "INSERT INTO dataset_ranks (dataset, tool, metric, rank, win, relative_score, "
+            "time_to_score_sec) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (dataset, t, metric, *ranked),
+        )
+        _bump_engine(conn, t, 1, *ranked)
+
+
+def _backfill_aggregates(conn):
+    """
+    One-time build of the aggregates from results stored before they
+    existed, redone whenever AGGREGATES_KEY changes. Guarded like the
+    legacy import.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = conn.execute(
+            "SELECT 1 FROM meta WHERE key = ?", (AGGREGATES_KEY,)
+        ).fetchone()
+
+        if not done:
+            for table in ("latest_results", "best_metrics", "dataset_ranks", "engine_stats"):
+                conn.execute(f"DELETE FROM {table}")
+            latest, params = _latest_filter()
+            for result_id, data in conn.execute(
+                f"SELECT id, data FROM results WHERE {latest} ORDER BY id", params
+            ).fetchall():
+                _update_aggregates(conn, result_id, json.loads(data))
+
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (AGGREGATES_KEY, str(time.time())),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def best_per_metric(dataset):
+    """
+    {metric: {tool, value, model}} over the latest result of every engine,
+    lower-is-better for error metrics.
+    """
+    rows = _connect().execute(
+        "SELECT metric, tool, value, model FROM best_metrics WHERE dataset = ?", (dataset,)
+    ).fetchall()
+    return {
+        metric: {"tool": tool, "value": value, "model": model}
+        for metric, tool, value, model in rows
+    }
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def dataset_ranking(dataset):
+    rows = _connect().execute(
+        "SELECT tool, metric, rank, win, relative_score, time_to_score_sec "
+        "FROM dataset_ranks WHERE dataset = ? ORDER BY rank",
+        (dataset,),
+    ).fetchall()
+    return [
+        {
+            "tool": tool,
+            "metric": metric,
+            "rank": rank,
+            "win": bool(win),
+            "relative_score": relative_score,
+            "time_to_score_sec": time_to_score_sec,
+        }
+        for tool, metric, rank, win, relative_score, time_to_score_sec in rows
+    ]
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def engine_rankings():
+    """
+    Every engine's average rank and wins across datasets, with its mean
+    relative score and time to reach it; best average rank first.
+    """
+    rows = _connect().execute(
+        "SELECT tool, datasets, rank_sum, wins, relative_score_sum, time_to_score_sum, "
+        "timed_datasets FROM engine_stats WHERE datasets > 0 "
+        "ORDER BY rank_sum / datasets, tool"
+    ).fetchall()
+    rankings = []
+    for tool, datasets, rank_sum, wins, rel_sum, time_sum, timed_datasets in rows:
+        avg_time = time_sum / timed_datasets if timed_datasets else None
+        avg_rel = rel_sum / datasets
+        rankings.append({
+            "tool": tool,
+            "datasets": datasets,
+            "avg_rank": round(rank_sum / datasets, 3),
+            "wins": wins,
+            "avg_relative_score": round(avg_rel, 4),
+            "avg_time_to_score_sec": round(avg_time, 2) if avg_time is not None else None,
+            # share of the best score reached per minute of training
+            "score_per_minute": round(avg_rel / (avg_time / 60), 4) if avg_time else None,
+        })
+    return rankings
+
+
+# -------------------- RUN MEMO --------------------
+
+@timed(REGISTRY_SECONDS, op="read")
+def find_memo(fingerprint):
+    """
+    Stored result for a run fingerprint, or None. Marks the memo as used.
+    """
+    conn = _connect()
+    row = conn.execute(
+        """
+        SELECT r.data FROM memo m JOIN results r ON r.id = m.result_id
+        WHERE m.fingerprint = ?
+        """,
+        (fingerprint,),
+    ).fetchone()
+    if row is None:
+        return None
+
+    conn.execute(
+        "UPDATE memo SET last_used = ? WHERE fingerprint = ?",
+        (time.time(), fingerprint),
+    )
+    return json.loads(row[0])
+
+
+@timed(REGISTRY_SECONDS, op="write")
+def save_memo(fingerprint, result_id, max_entries):
+    """
+    Map a run fingerprint to its result and evict the least recently
+    used memos beyond max_entries. Evicted results that are no longer
+    the latest for their (dataset, tool) are deleted with them.
+    Returns the evicted fingerprints and the run ids of deleted results.
+    """
+    now = time.time()
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # a forced re-run replaces the memo; its old result is dropped too
+        replaced = conn.execute(
+            "SELECT result_id FROM memo WHERE fingerprint = ?", (fingerprint,)
+        ).fetchall()
+        conn.execute(
+            "INSERT OR REPLACE INTO memo (fingerprint, result_id, created, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            (fingerprint, result_id, now, now),
+        )
+
+        evicted = conn.execute(
+            "SELECT fingerprint, result_id FROM memo ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+            (max_entries,),
+        ).fetchall()
+        conn.executemany(
+            "DELETE FROM memo WHERE fingerprint = ?", [(fp,) for fp, _ in evicted]
+        )
+
+        stale = [rid for (rid,) in replaced if rid != result_id] + [rid for _, rid in evicted]
+        deleted_runs = []
+        for rid in stale:
+            row = conn.execute(
+                """
+                SELECT json_extract(data, '$.run_id') FROM results WHERE id = ? AND id NOT IN (
+                    SELECT MAX(id) FROM results GROUP BY dataset, tool
+                )
+                """,
+                (rid,),
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM results WHERE id = ?", (rid,))
+                deleted_runs.append(row[0])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [fp for fp, _ in evicted], deleted_runs
+
+
+# -------------------- FLAML WARM START --------------------
+
+def _json_default(value):
+    # numpy scalars inside FLAML configs
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+@timed(REGISTRY_SECONDS, op="write")
+def save_flaml_configs(dataset, task, features, configs, score, max_entries):
+    """
+    Store a dataset's meta-features with its best FLAML config per
+    estimator (newest run per dataset wins); oldest rows beyond
+    max_entries are dropped.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO flaml_configs "
+            "(dataset, task, features, configs, score, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                dataset,
+                task,
+                json.dumps(features),
+                json.dumps(configs, default=_json_default),
+                score,
+                time.time(),
+            ),
+        )
+        conn.execute(
+            """
+            DELETE FROM flaml_configs WHERE rowid IN (
+                SELECT rowid FROM flaml_configs ORDER BY created DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_entries,),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+@timed(REGISTRY_SECONDS, op="read")
+def load_flaml_configs(task):
+    rows = _connect().execute(
+        "SELECT dataset, features, configs, score FROM flaml_configs WHERE task = ?",
+        (task,),
+    ).fetchall()
+    return [
+        {
+            "dataset": dataset,
+            "features": json.loads(features),
+            "configs": json.loads(configs),
+            "score": score,
+        }
+        for dataset, features, configs, score in rows
+    ]
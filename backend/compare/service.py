@@ -1,10 +1,7 @@
-from backend.compare.registry import load_results
+from backend.compare.registry import best_per_metric, load_results
 
 def compare_results(dataset: str, selected_tool: str):
-    records = [
-        r for r in load_results()
-        if r.get("dataset") == dataset
-    ]
+    records = load_results(dataset=dataset)
 
     selected = None
     others = []
@@ -15,23 +12,9 @@ def compare_results(dataset: str, selected_tool: str):
         else:
             others.append(r)
 
-    # compute best-per-metric across ALL tools
-    best_per_metric = {}
-
-    for r in records:
-        metrics = r.get("metrics", {})
-        for k, v in metrics.items():
-            if not isinstance(v, (int, float)):
-                continue
-            if k not in best_per_metric or v > best_per_metric[k]["value"]:
-                best_per_metric[k] = {
-                    "tool": r.get("tool"),
-                    "value": v,
-                    "model": r.get("best_model"),
-                }
-
     return {
         "selected": selected,
         "others": others,
-        "best_per_metric": best_per_metric,
+        # maintained by the registry as results are saved
+        "best_per_metric": best_per_metric(dataset),
     }
@@ -0,0 +1,122 @@
+import os
+
+# -------------------- JOBS --------------------
+# number of pipeline jobs allowed to train at the same time;
+# extra submissions wait in the queue until a slot frees up
+JOB_SLOTS = int(os.getenv("AUTOML_JOB_SLOTS", "2"))
+
+# finished jobs kept in memory for /jobs/{id} lookups
+JOB_HISTORY = int(os.getenv("AUTOML_JOB_HISTORY", "200"))
+
+# -------------------- UPLOADS --------------------
+UPLOAD_CHUNK_BYTES = int(os.getenv("AUTOML_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("AUTOML_MAX_UPLOAD_BYTES", str(10 * 1024 ** 3)))
+
+# -------------------- DATASET CACHE --------------------
+# CSV bytes parsed per record batch when an upload is converted to its
+# columnar cache; bounds the API process's memory while it converts
+CACHE_BLOCK_BYTES = int(os.getenv("AUTOML_CACHE_BLOCK_BYTES", str(64 * 1024 ** 2)))
+# preprocessed splits and matrices (one set per dataset version) kept on
+# disk; least recently used sets are removed beyond this
+PREP_CACHE_BYTES = int(os.getenv("AUTOML_PREP_CACHE_BYTES", str(20 * 1024 ** 3)))
+
+# -------------------- H2O --------------------
+# -1 lets the JVM use every core; memory defaults to a share of host RAM
+H2O_NTHREADS = int(os.getenv("AUTOML_H2O_NTHREADS", "-1"))
+H2O_MAX_MEM = os.getenv("AUTOML_H2O_MAX_MEM", "")
+H2O_MEM_FRACTION = float(os.getenv("AUTOML_H2O_MEM_FRACTION", "0.5"))
+# "import": write splits to Parquet and let H2O parse them in parallel
+# "frame": upload straight from pandas via H2OFrame (slower, no temp files)
+H2O_INGEST_MODE = os.getenv("AUTOML_H2O_INGEST_MODE", "import")
+
+# -------------------- TPOT --------------------
+# population grows with the cores TPOT is given so every generation keeps
+# them all busy; generations are sized from the budget assuming one
+# pipeline evaluation costs about TPOT_SEC_PER_PIPELINE on one core
+TPOT_MIN_POPULATION = int(os.getenv("AUTOML_TPOT_MIN_POPULATION", "20"))
+TPOT_POPULATION_PER_CORE = int(os.getenv("AUTOML_TPOT_POPULATION_PER_CORE", "4"))
+TPOT_SEC_PER_PIPELINE = float(os.getenv("AUTOML_TPOT_SEC_PER_PIPELINE", "2.0"))
+# periodic exports of the best pipeline; kept only when a run dies
+TPOT_CHECKPOINT_DIR = os.getenv("AUTOML_TPOT_CHECKPOINT_DIR", "backend/storage/tpot_checkpoints")
+
+# -------------------- FLAML WARM START --------------------
+# best FLAML configs of past runs are stored with their dataset's
+# meta-features; new runs start from the configs of the nearest datasets
+FLAML_WARM_START = os.getenv("AUTOML_FLAML_WARM_START", "1").lower() in ("1", "true", "yes")
+FLAML_WARM_START_K = int(os.getenv("AUTOML_FLAML_WARM_START_K", "3"))
+FLAML_WARM_START_MAX_ENTRIES = int(os.getenv("AUTOML_FLAML_WARM_START_MAX_ENTRIES", "1000"))
+
+# -------------------- EVALUATION --------------------
+LEADERBOARD_TOP_K = int(os.getenv("AUTOML_LEADERBOARD_TOP_K", "5"))
+# threads used to score leaderboard models when the engine has no batch API
+SCORING_THREADS = int(os.getenv("AUTOML_SCORING_THREADS", "4"))
+
+# -------------------- RESOURCE SAMPLER --------------------
+SAMPLER_INTERVAL_SEC = float(os.getenv("AUTOML_SAMPLER_INTERVAL_SEC", "1.0"))
+# ring buffer length; peaks are tracked separately so they survive wrap-around
+SAMPLER_CAPACITY = int(os.getenv("AUTOML_SAMPLER_CAPACITY", "3600"))
+# points kept in the stored time series after downsampling
+TIMESERIES_POINTS = int(os.getenv("AUTOML_TIMESERIES_POINTS", "120"))
+# finer sampling while tracing spans, so short stages still see their peak RSS
+SPAN_SAMPLER_INTERVAL_SEC = float(os.getenv("AUTOML_SPAN_SAMPLER_INTERVAL_SEC", "0.2"))
+
+# -------------------- WEBSOCKET TELEMETRY --------------------
+# host stats are sampled once per interval and shared by every viewer
+TELEMETRY_INTERVAL_SEC = float(os.getenv("AUTOML_TELEMETRY_INTERVAL_SEC", "1.0"))
+# log lines and stats are coalesced into at most one flush per period
+TELEMETRY_FLUSH_SEC = float(os.getenv("AUTOML_TELEMETRY_FLUSH_SEC", "0.25"))
+# log lines held for a slow client; older ones are dropped beyond this
+TELEMETRY_LOG_BUFFER = int(os.getenv("AUTOML_TELEMETRY_LOG_BUFFER", "1000"))
+
+# -------------------- BASELINE / EARLY STOP --------------------
+# a linear baseline is fitted before the engines; an engine whose leader
+# after EARLY_STOP_FRACTION of its budget does not beat the baseline by
+# EARLY_STOP_MARGIN (relative) is stopped and the rest of the budget saved
+EARLY_STOP = os.getenv("AUTOML_EARLY_STOP", "1").lower() in ("1", "true", "yes")
+EARLY_STOP_FRACTION = float(os.getenv("AUTOML_EARLY_STOP_FRACTION", "0.3"))
+EARLY_STOP_MARGIN = float(os.getenv("AUTOML_EARLY_STOP_MARGIN", "0.01"))
+# the baseline is fitted on a stratified sample of at most this many rows
+BASELINE_MAX_ROWS = int(os.getenv("AUTOML_BASELINE_MAX_ROWS", "100000"))
+
+# -------------------- RACE MODE --------------------
+# share of host RAM divided between the JOB_SLOTS jobs and, within a
+# job, between the engines racing on one split
+RACE_MEM_FRACTION = float(os.getenv("AUTOML_RACE_MEM_FRACTION", "0.8"))
+
+# -------------------- PROGRESSIVE MODE --------------------
+# successive halving: engines first train on these stratified fractions
+# of the training split, each rung with a slice of their budget; only
+# the best PROGRESSIVE_KEEP share moves on, finalists get the rest of
+# their budget on the full split
+PROGRESSIVE_RUNGS = [
+    float(f) for f in os.getenv("AUTOML_PROGRESSIVE_RUNGS", "0.05,0.2").split(",") if f.strip()
+]
+PROGRESSIVE_KEEP = float(os.getenv("AUTOML_PROGRESSIVE_KEEP", "0.5"))
+PROGRESSIVE_RUNG_BUDGET = float(os.getenv("AUTOML_PROGRESSIVE_RUNG_BUDGET", "0.2"))
+# rungs whose sample would be smaller than this are skipped
+PROGRESSIVE_MIN_ROWS = int(os.getenv("AUTOML_PROGRESSIVE_MIN_ROWS", "1000"))
+
+# -------------------- MODEL ARTIFACTS / INFERENCE --------------------
+# each run's best model is saved under backend/storage/models/<run_id>
+SAVE_MODELS = os.getenv("AUTOML_SAVE_MODELS", "1").lower() in ("1", "true", "yes")
+# models kept loaded for /predict, bounded by their size on disk
+MODEL_CACHE_BYTES = int(os.getenv("AUTOML_MODEL_CACHE_BYTES", str(2 * 1024 ** 3)))
+# rows scored per chunk of a /predict upload
+PREDICT_CHUNK_ROWS = int(os.getenv("AUTOML_PREDICT_CHUNK_ROWS", "50000"))
+
+# -------------------- PROFILING --------------------
+# cProfile every engine fit (also per run with "profile": true); the stats
+# are saved under backend/storage/profiles/<run_id>.prof
+PROFILE_RUNS = os.getenv("AUTOML_PROFILE_RUNS", "0").lower() in ("1", "true", "yes")
+# functions listed by /runs/{id}/profile
+PROFILE_TOP_FUNCTIONS = int(os.getenv("AUTOML_PROFILE_TOP_FUNCTIONS", "30"))
+
+# -------------------- METRICS --------------------
+# per-process metric files summed by /metrics (prometheus_client
+# multiprocess mode); PROMETHEUS_MULTIPROC_DIR takes precedence
+METRICS_DIR = os.getenv("AUTOML_METRICS_DIR", "backend/storage/prometheus")
+
+# -------------------- RUN MEMOIZATION --------------------
+# identical runs (same bytes, engine version, split and budget) reuse the
+# stored result; least recently used memo entries beyond this are evicted
+MEMO_MAX_ENTRIES = int(os.getenv("AUTOML_MEMO_MAX_ENTRIES", "500"))
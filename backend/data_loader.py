@@ -1,12 +1,34 @@
+import time
+
 import pandas as pd
+import pyarrow as pa
+from .dataset_cache import is_fresh, read_cache, write_cache
 from .logger import setup_logger
+from .monitoring import record_load
 
 log = setup_logger("DATA")
 
-def load_dataset(path: str) -> pd.DataFrame:
+def load_dataset(path: str, columns=None) -> pd.DataFrame:
     log.info(f"Loading dataset from {path}")
-    df = pd.read_csv(path)
+    start = time.perf_counter()
+
+    if is_fresh(path):
+        df = read_cache(path, columns=columns)
+        source = "cache"
+        log.info("Loaded from columnar cache")
+    else:
+        log.info("Columnar cache missing or stale, parsing CSV")
+        df = pd.read_csv(path, usecols=columns)
+        source = "csv"
+        if columns is None:
+            try:
+                write_cache(path, df)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                # e.g. a column pandas parsed with mixed types
+                log.warning(f"Columnar cache not written, using the CSV: {e}")
+
+    record_load(source, df.shape[0], time.perf_counter() - start)
+
     log.info(f"Rows: {df.shape[0]}, Columns: {df.shape[1]}")
     log.info(f"Columns: {list(df.columns)}")
     return df
-
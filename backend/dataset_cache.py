@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+
+from backend import config
+from backend.logger import setup_logger
+
+CACHE_DIR = os.path.join("datasets", ".cache")
+
+# same strings pandas.read_csv treats as missing by default
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+}
+# profile dtype -> Arrow type, so streamed batches agree with pandas
+_ARROW_TYPES = {
+    "int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_(), "object": pa.string(),
+}
+
+log = setup_logger("CACHE")
+
+
+def fingerprint(path: str) -> str:
+    """
+    Cheap identity of a source file: size + modification time.
+    """
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def content_hash(path: str) -> str:
+    """
+    SHA-256 of the file bytes, memoized against the cheap fingerprint
+    so unchanged files are hashed only once.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    hash_path = os.path.join(CACHE_DIR, f"{os.path.basename(path)}.sha256.json")
+    fp = fingerprint(path)
+
+    if os.path.exists(hash_path):
+        with open(hash_path, "r") as f:
+            stored = json.load(f)
+        if stored.get("fingerprint") == fp:
+            return stored["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    with open(hash_path, "w") as f:
+        json.dump({"fingerprint": fp, "sha256": digest.hexdigest()}, f)
+    return digest.hexdigest()
+
+
+def _cache_paths(path: str):
+    name = os.path.basename(path)
+    return (
+        os.path.join(CACHE_DIR, f"{name}.arrow"),
+        os.path.join(CACHE_DIR, f"{name}.meta.json"),
+    )
+
+
+def read_meta(path: str):
+    _, meta_path = _cache_paths(path)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f)
+
+
+def is_fresh(path: str) -> bool:
+    arrow_path, _ = _cache_paths(path)
+    meta = read_meta(path)
+    return (
+        meta is not None
+        and os.path.exists(arrow_path)
+        and meta.get("fingerprint") == fingerprint(path)
+    )
+
+
+def _temp_path(final_path: str) -> str:
+    """
+    Unique temp file next to final_path, so concurrent writers of the same
+    cache never share one; callers os.replace it into place.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(final_path), prefix=os.path.basename(final_path), suffix=".tmp"
+    )
+    os.close(fd)
+    return tmp_path
+
+
+def _publish(path: str, arrow_path: str, tmp_path: str, schema: pa.Schema, rows: int):
+    _, meta_path = _cache_paths(path)
+    meta = {
+        "source": os.path.basename(path),
+        "fingerprint": fingerprint(path),
+        "rows": rows,
+        "columns": schema.names,
+        "schema": {f.name: str(f.type) for f in schema},
+    }
+    os.replace(tmp_path, arrow_path)
+
+    tmp_meta = _temp_path(meta_path)
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_meta, meta_path)
+
+    log.info(f"Cached {meta['source']} ({rows} rows) -> {arrow_path}")
+    return meta
+
+
+def write_ipc(table: pa.Table, path: str):
+    """
+    Uncompressed Arrow IPC file holding one record batch per column, so
+    memory-mapped reads convert numeric columns to pandas without a copy.
+    """
+    table = table.combine_chunks()
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+
+
+def write_cache(path: str, df: pd.DataFrame):
+    """
+    Store df as an uncompressed Arrow IPC file so later loads can
+    memory-map it instead of parsing the CSV again.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    arrow_path, _ = _cache_paths(path)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = _temp_path(arrow_path)
+    try:
+        write_ipc(table, tmp_path)
+        return _publish(path, arrow_path, tmp_path, table.schema, table.num_rows)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_cache(path: str, dtypes=None):
+    """
+    Convert a CSV dataset into its columnar cache (skips fresh caches).
+    The CSV is streamed in CACHE_BLOCK_BYTES record batches, so the whole
+    dataset is never held in memory. `dtypes` ({column: pandas dtype},
+    from the upload profile) fixes column types for the whole file;
+    without them types are inferred from the first block. A file whose
+    later rows do not fit those types is left to load_dataset.
+    """
+    if is_fresh(path):
+        return read_meta(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    arrow_path, _ = _cache_paths(path)
+
+    column_types = {
+        name: _ARROW_TYPES[dtype] for name, dtype in (dtypes or {}).items()
+        if dtype in _ARROW_TYPES
+    }
+    tmp_path = _temp_path(arrow_path)
+    try:
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=config.CACHE_BLOCK_BYTES),
+            convert_options=pacsv.ConvertOptions(
+                column_types=column_types,
+                null_values=list(NA_VALUES),
+                strings_can_be_null=True,
+            ),
+        )
+        # all-missing columns are float64 in pandas, not Arrow's null type
+        schema = pa.schema([
+            f.with_type(pa.float64()) if pa.types.is_null(f.type) else f
+            for f in reader.schema
+        ])
+        rows = 0
+        with pa.ipc.new_file(tmp_path, schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch.cast(schema) if batch.schema != schema else batch)
+                rows += batch.num_rows
+        return _publish(path, arrow_path, tmp_path, schema, rows)
+    except pa.ArrowInvalid as e:
+        log.warning(f"Streaming cache build failed for {path}, left to first load: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_table(path: str, columns=None) -> pa.Table:
+    """
+    Memory-mapped Arrow table of the cache; no bytes are copied until
+    a column is converted.
+    """
+    arrow_path, _ = _cache_paths(path)
+    return feather.read_table(arrow_path, columns=columns, memory_map=True)
+
+
+def frame_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Arrow table of df for data that has no cache. Object columns Arrow
+    cannot convert (values of mixed types) are stored as text, nulls kept.
+    """
+    columns = {}
+    for c in df.columns:
+        try:
+            columns[str(c)] = pa.array(df[c], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[str(c)] = pa.array(df[c].astype(str).where(df[c].notna()), from_pandas=True)
+    return pa.table(columns)
+
+
+def read_cache(path: str, columns=None) -> pd.DataFrame:
+    return read_table(path, columns=columns).to_pandas(split_blocks=True)
@@ -0,0 +1,71 @@
+import importlib
+import importlib.metadata
+import importlib.util
+import threading
+
+from .logger import setup_logger
+
+log = setup_logger("ENGINES")
+
+# engine -> (runner module, runner function, framework package)
+# runner modules import their framework at module level, so nothing here
+# is imported until an engine is actually used
+ENGINES = {
+    "h2o": ("backend.h2o_runner", "run_h2o", "h2o"),
+    "autogluon": ("backend.autogluon_runner", "run_autogluon", "autogluon.tabular"),
+    "tpot": ("backend.tpot_runner", "run_tpot", "tpot"),
+    "flaml": ("backend.flaml_runner", "run_flaml", "flaml"),
+}
+
+# default training budget (seconds) handed to each runner
+TIME_LIMITS = {
+    "h2o": 60,
+    "autogluon": 60,
+    "tpot": 120,
+    "flaml": 60,
+}
+
+_modules = {}
+_lock = threading.Lock()
+
+
+def is_installed(engine: str) -> bool:
+    """
+    Whether the engine's framework can be imported, without importing it.
+    """
+    try:
+        return importlib.util.find_spec(ENGINES[engine][2]) is not None
+    except (KeyError, ModuleNotFoundError, ValueError):
+        return False
+
+
+def engine_version(engine: str) -> str:
+    try:
+        return importlib.metadata.version(ENGINES[engine][2])
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def available_engines():
+    return {name: is_installed(name) for name in ENGINES}
+
+
+def runner_module(engine: str):
+    """
+    Import the engine's runner module on first use.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    with _lock:
+        if engine not in _modules:
+            log.info(f"Loading {engine} runner")
+            _modules[engine] = importlib.import_module(ENGINES[engine][0])
+    return _modules[engine]
+
+
+def get_runner(engine: str):
+    """
+    The engine's run function (imports its runner on first use).
+    """
+    return getattr(runner_module(engine), ENGINES[engine][1])
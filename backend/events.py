@@ -0,0 +1,105 @@
+import asyncio
+import queue as queue_module
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# blocking queue reads wait here instead of in the loop's default
+# executor; each read gives up after POLL_SEC so an abandoned stream
+# frees its thread instead of holding it until the next event
+_READERS = ThreadPoolExecutor(thread_name_prefix="events")
+POLL_SEC = 0.5
+
+
+class RunEvents:
+    """
+    Per-run event bus. The orchestrator and the runners publish onto the
+    job's queue from any thread or worker process; aiter_queue() bridges
+    the queue to asyncio for the WebSocket. Events from one engine of a
+    multi-engine run are tagged with its name.
+    """
+
+    def __init__(self, queue=None, engine=None):
+        self.queue = queue
+        self.engine = engine
+
+    @classmethod
+    def wrap(cls, events):
+        return events if isinstance(events, cls) else cls(events)
+
+    def for_engine(self, engine):
+        return RunEvents(self.queue, engine)
+
+    def put(self, event):
+        if self.queue is None:
+            return
+        if self.engine is not None:
+            event = {**event, "engine": self.engine}
+        self.queue.put(event)
+
+    def log(self, message):
+        self.put({"type": "log", "message": message})
+
+    def stats(self, sample):
+        self.put({"type": "run_stats", "data": sample})
+
+    def progress_reporter(self, budget_sec):
+        """
+        Callback for runners: report(data) publishes a progress event
+        (models_trained, best_score, score_name, ...) stamped with the
+        elapsed share of the engine's budget.
+        """
+        start = time.perf_counter()
+
+        def report(data):
+            elapsed = time.perf_counter() - start
+            self.put({
+                "type": "progress",
+                "data": {
+                    **data,
+                    "elapsed_sec": round(elapsed, 1),
+                    "budget_sec": budget_sec,
+                    "budget_used": round(min(1.0, elapsed / budget_sec), 3) if budget_sec else None,
+                },
+            })
+
+        return report
+
+
+def _read(queue, timeout):
+    try:
+        return True, queue.get(timeout=timeout)
+    except queue_module.Empty:
+        return False, None
+
+
+def _requeue(queue):
+    # a read still in flight when its stream is cancelled may take an
+    # event meant for the next reader (a reconnecting client); hand it back
+    def done(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        got, event = future.result()
+        if got:
+            queue.put(event)
+
+    return done
+
+
+async def aiter_queue(queue, sentinel=None):
+    """
+    Async iterator over a blocking queue until `sentinel` arrives. Each
+    get waits up to POLL_SEC in a dedicated reader thread, so the event
+    loop never blocks and a cancelled stream stops reading.
+    """
+    while True:
+        future = _READERS.submit(_read, queue, POLL_SEC)
+        try:
+            got, event = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_requeue(queue))
+            raise
+        if not got:
+            continue
+        if event is sentinel:
+            return
+        yield event
@@ -0,0 +1,95 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+
+from .logger import setup_logger
+
+log = setup_logger("FOLLOW")
+
+IN_MODIFY = 0x00000002
+IN_CLOEXEC = 0o2000000
+
+# only used where inotify is unavailable (non-Linux hosts)
+FALLBACK_POLL_SEC = 0.5
+
+
+def _inotify_watch(path):
+    """
+    inotify descriptor watching path for writes, or None if the
+    platform has no inotify.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(path), IN_MODIFY) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class FileFollower(threading.Thread):
+    """
+    Calls on_line for every complete line appended to a file. Sleeps in
+    select() on an inotify descriptor until the file is written instead
+    of polling; stop() wakes it through a pipe.
+    """
+
+    def __init__(self, path, on_line, from_start=False):
+        super().__init__(daemon=True)
+        self.path = path
+        self.on_line = on_line
+        self.from_start = from_start
+        self._stopping = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._partial = ""
+
+    def stop(self):
+        self._stopping.set()
+        os.write(self._wake_w, b"x")
+        self.join(timeout=5)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _drain(self, f):
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                return
+            if not chunk.endswith("\n"):
+                # writer is mid-line; finish it on the next event
+                self._partial += chunk
+                continue
+            line, self._partial = self._partial + chunk, ""
+            try:
+                self.on_line(line.rstrip("\n"))
+            except Exception as e:
+                log.warning(f"Line handler failed: {e}")
+
+    def _wait(self, fd):
+        if fd is None:
+            self._stopping.wait(FALLBACK_POLL_SEC)
+            return
+        ready, _, _ = select.select([fd, self._wake_r], [], [])
+        if fd in ready:
+            # the events themselves carry nothing we need
+            os.read(fd, 4096)
+
+    def run(self):
+        fd = _inotify_watch(self.path)
+        try:
+            with open(self.path, "r", errors="ignore") as f:
+                if not self.from_start:
+                    f.seek(0, 2)
+                while not self._stopping.is_set():
+                    self._drain(f)
+                    self._wait(fd)
+                self._drain(f)
+        finally:
+            if fd is not None:
+                os.close(fd)
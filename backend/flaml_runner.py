@@ -1,63 +1,126 @@
+import json
+import os
+import pickle
+import tempfile
+import time
+
 from flaml import AutoML
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    mean_squared_error,
-    mean_absolute_error,
-    r2_score,
-)
+from .file_follower import FileFollower
+from .metrics import primary_metric, score_predictions
 from .logger import setup_logger
+from .tracing import span
 
 log = setup_logger("FLAML")
 
 MIN_ROWS = 50
 
 
-def run_flaml(X_train, X_test, y_train, y_test, task: str, time_limit: int = 60):
+class _TrialLog:
+    """
+    Progress from FLAML's training log, one JSON record per trial as
+    FLAML appends them (log_type="all"). Checkpoint records are skipped.
+    """
+
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+        self.trials = 0
+        self.best_loss = None
+
+    def __call__(self, line):
+        record = json.loads(line)
+        if "validation_loss" not in record:
+            return
+        self.trials += 1
+        loss = record["validation_loss"]
+        if self.best_loss is None or loss < self.best_loss:
+            self.best_loss = loss
+        self.on_progress({
+            "models_trained": self.trials,
+            "best_score": round(self.best_loss, 4),
+            "score_name": "val_loss",
+            "learner": record.get("learner"),
+        })
+
+
+def _validation_score(automl, metric):
+    """
+    Best validation score of the search (FLAML minimizes 1 - accuracy).
+    """
+    if automl.best_loss is None or automl.best_loss == float("inf"):
+        return None
+    return 1 - automl.best_loss if metric == "accuracy" else automl.best_loss
+
+
+def run_flaml(X_train, X_test, y_train, y_test, task: str, time_limit: int = 60, resources=None,
+              early_stop=None, artifact_dir=None, starting_points=None, on_progress=None):
     if X_train.shape[0] < MIN_ROWS:
         return {"skipped": True, "reason": "Dataset too small"}
 
     log.info("Starting FLAML")
 
     automl = AutoML()
+    # FLAML searches on the metric engines are ranked by, so its
+    # validation loss doubles as the early-stop signal
+    metric = primary_metric(task)
+    first, rest = early_stop.phases(time_limit) if early_stop else (time_limit, 0)
 
-    automl.fit(
-        X_train=X_train,
-        y_train=y_train,
-        task=task,
-        time_budget=time_limit,
-        verbose=0,
-    )
-
-    preds = automl.predict(X_test)
-
-    if task == "classification":
-        acc = float(accuracy_score(y_test, preds))
-        prec = float(precision_score(y_test, preds, average="weighted", zero_division=0))
-        rec = float(recall_score(y_test, preds, average="weighted", zero_division=0))
-        f1 = float(f1_score(y_test, preds, average="weighted", zero_division=0))
-
-        metrics = {
-            "accuracy": round(acc, 4),
-            "precision_weighted": round(prec, 4),
-            "recall_weighted": round(rec, 4),
-            "f1_weighted": round(f1, 4),
-        }
-    else:
-        rmse = float(mean_squared_error(y_test, preds, squared=False))
-        mae = float(mean_absolute_error(y_test, preds))
-        r2 = float(r2_score(y_test, preds))
-
-        metrics = {
-            "rmse": round(rmse, 4),
-            "mae": round(mae, 4),
-            "r2": round(r2, 4),
-        }
+    # FLAML flushes a record per trial; following the file gives live
+    # progress without a callback API
+    log_file = follower = None
+    if on_progress:
+        fd, log_file = tempfile.mkstemp(prefix="flaml_", suffix=".log")
+        os.close(fd)
+        follower = FileFollower(log_file, _TrialLog(on_progress), from_start=True)
+        follower.start()
 
+    def fit(budget, starting_points=None, append_log=False):
+        automl.fit(
+            X_train=X_train,
+            y_train=y_train,
+            task=task,
+            metric=metric,
+            time_budget=budget,
+            n_jobs=resources["cpus"] if resources else -1,
+            starting_points=starting_points,
+            log_file_name=log_file or "",
+            log_type="all",
+            append_log=append_log,
+            verbose=0,
+        )
+
+    try:
+        # warm start: configs that did well on similar datasets are tried first
+        start = time.perf_counter()
+        fit(first, starting_points=starting_points)
+        phase_one_sec = time.perf_counter() - start
+        best_loss, time_to_best = automl.best_loss, automl.time_to_find_best_model
+
+        stop_report = None
+        if early_stop:
+            interim = _validation_score(automl, metric)
+            stopped = early_stop.should_stop(interim)
+            stop_report = early_stop.report(time_limit, stopped, interim=interim)
+            if stopped:
+                log.info(f"FLAML did not beat the baseline, stopping after {first}s")
+            elif rest:
+                # second phase resumes the search from the best configs so far;
+                # it restarts FLAML's clock, so a better model found there is
+                # timed from the start of phase one
+                fit(rest, starting_points=automl.best_config_per_estimator, append_log=True)
+                if automl.best_loss < best_loss:
+                    time_to_best = phase_one_sec + automl.time_to_find_best_model
+    finally:
+        if follower:
+            follower.stop()
+            os.remove(log_file)
+
+    metrics = score_predictions(task, y_test, automl.predict(X_test))
     best_model_id = str(automl.best_estimator)
 
+    if artifact_dir:
+        with span("persist"), open(os.path.join(artifact_dir, "model.pkl"), "wb") as f:
+            pickle.dump(automl, f)
+
     leaderboard = [
         {
             "model_id": best_model_id,
@@ -70,4 +133,20 @@ def run_flaml(X_train, X_test, y_train, y_test, task: str, time_limit: int = 60)
         "best_model": best_model_id,
         "metrics": metrics,
         "leaderboard": leaderboard,
+        "validation_score": _validation_score(automl, metric),
+        "early_stop": stop_report,
+        "details": {
+            "warm_start_points": sum(len(v) for v in (starting_points or {}).values()),
+            "time_to_best_sec": round(time_to_best, 2),
+            "best_config_per_estimator": automl.best_config_per_estimator,
+        },
     }
+
+
+def load_model(artifact_dir):
+    with open(os.path.join(artifact_dir, "model.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+def predict_model(model, X):
+    return model.predict(X)
@@ -1,96 +1,223 @@
 import h2o
 import time
-import threading
 import os
+import re
+import shutil
+import tempfile
+import uuid
 from h2o.automl import H2OAutoML
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
+from backend import config
+from .file_follower import FileFollower
+from .h2o_session import get_session, release
+from .leaderboard import evaluate_leaderboard
+from .metrics import primary_metric
 from .logger import setup_logger
+from .tracing import span
 
 log = setup_logger("H2O")
 
 MIN_ROWS = 50
 H2O_LOG_FILE = os.path.expanduser("~/.h2oai/h2o.log")
 
-
-def tail_file(path, callback, stop_flag):
-    with open(path, "r", errors="ignore") as f:
-        f.seek(0, 2)
-        while not stop_flag["stop"]:
-            line = f.readline()
-            if line:
-                callback(line.rstrip())
-            else:
-                time.sleep(0.1)
-
-
-def run_h2o(train_df, test_df, target, task, time_limit=60, log_callback=None):
+# e.g. GBM_grid_1_AutoML_2_20240101_120000_model_3
+MODEL_ID = re.compile(r"\b[A-Za-z]\w*?_AutoML_\d+_\d{8}_\d+(?:_model_\d+)?\b")
+NEW_LEADER = re.compile(r"New leader: (\S+?),\s*(\w+): ([-+\d.eE]+)")
+
+
+class _AutoMLLog:
+    """
+    Progress from the cluster log: every model id AutoML mentions counts
+    as trained, and its "New leader" lines carry the best score.
+    AutoML lines are also forwarded to log_callback.
+    """
+
+    def __init__(self, on_progress=None, log_callback=None):
+        self.on_progress = on_progress
+        self.log_callback = log_callback
+        self.models = set()
+        self.leader = None
+
+    def __call__(self, line):
+        if "AutoML" not in line:
+            return
+        if self.log_callback:
+            self.log_callback(line)
+
+        seen = len(self.models)
+        self.models.update(MODEL_ID.findall(line))
+        leader = NEW_LEADER.search(line)
+        if leader:
+            self.leader = leader
+
+        if self.on_progress and (leader or len(self.models) > seen):
+            self.on_progress({
+                "models_trained": len(self.models),
+                "best_score": float(self.leader.group(3)) if self.leader else None,
+                "score_name": self.leader.group(2) if self.leader else None,
+                "leader": self.leader.group(1) if self.leader else None,
+            })
+
+
+def _validation_score(model, metric):
+    """
+    The model's cross-validated accuracy / rmse, or None when it has no
+    CV metrics.
+    """
+    try:
+        perf = model.model_performance(xval=True)
+        if perf is None:
+            return None
+        if metric == "rmse":
+            return float(perf.rmse())
+        if model._model_json["output"]["model_category"] == "Multinomial":
+            # top-1 hit ratio
+            return float(perf.hit_ratio_table().cell_values[0][1])
+        return float(perf.accuracy()[0][1])
+    except Exception as e:
+        log.warning(f"No cross-validation score for {model.model_id}: {e}")
+        return None
+
+
+def _import_frames(train_df, test_df, parquet=None):
+    """
+    Let the cluster parse both splits from Parquet with its parallel
+    importer instead of serializing through pandas. `parquet` are the
+    splits' files in the prep cache; without them (samples) the frames
+    are written to a temp directory first.
+    """
+    if parquet:
+        return [h2o.import_file(path) for path in parquet]
+
+    tmp_dir = tempfile.mkdtemp(prefix="h2o_ingest_")
+    try:
+        frames = []
+        for name, df in (("train", train_df), ("test", test_df)):
+            path = os.path.abspath(os.path.join(tmp_dir, f"{name}.parquet"))
+            df.to_parquet(path, index=False)
+            frames.append(h2o.import_file(path))
+        return frames
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _ingest(train_df, test_df, mode, parquet=None):
+    if mode == "import":
+        try:
+            return _import_frames(train_df, test_df, parquet)
+        except Exception as e:
+            log.warning(f"Parquet import failed, falling back to H2OFrame: {e}")
+    return h2o.H2OFrame(train_df), h2o.H2OFrame(test_df)
+
+
+def run_h2o(train_df, test_df, target, task, time_limit=60, log_callback=None,
+            ingest=config.H2O_INGEST_MODE, resources=None, early_stop=None, artifact_dir=None,
+            on_progress=None, parquet=None):
     if train_df.shape[0] < MIN_ROWS:
         return {"skipped": True, "reason": "Dataset too small"}
 
-    h2o.init(max_mem_size="2G", nthreads=2)
-
-    stop_flag = {"stop": False}
-
-    if log_callback and os.path.exists(H2O_LOG_FILE):
-        t = threading.Thread(
-            target=tail_file,
-            args=(H2O_LOG_FILE, log_callback, stop_flag),
-            daemon=True
+    get_session(resources)
+
+    follower = None
+    if (on_progress or log_callback) and os.path.exists(H2O_LOG_FILE):
+        follower = FileFollower(H2O_LOG_FILE, _AutoMLLog(on_progress, log_callback))
+        follower.start()
+
+    train = test = None
+    runs = []
+    stop_report = None
+
+    try:
+        ingest_start = time.perf_counter()
+        with span("ingest"):
+            train, test = _ingest(train_df, test_df, ingest, parquet)
+        ingest_sec = round(time.perf_counter() - ingest_start, 2)
+        log.info(f"Ingested splits into H2O ({ingest}) in {ingest_sec}s")
+
+        if task == "classification":
+            train[target] = train[target].asfactor()
+            test[target] = test[target].asfactor()
+
+        # both phases share one project, so the second run adds its
+        # models to the leaderboard of the first
+        project = f"automl_{uuid.uuid4().hex[:12]}"
+
+        def automl(budget):
+            aml = H2OAutoML(
+                max_runtime_secs=budget,
+                exclude_algos=["DeepLearning"],
+                project_name=project,
+                verbosity="info"
+            )
+            runs.append(aml)
+            aml.train(y=target, training_frame=train)
+            return aml
+
+        y_true = test_df[target].values
+
+        def predict(model_id):
+            pred_frame = h2o.get_model(model_id).predict(test)
+            try:
+                return pred_frame.as_data_frame().iloc[:, 0].values
+            finally:
+                release(pred_frame)
+
+        first, rest = early_stop.phases(time_limit) if early_stop else (time_limit, 0)
+        aml = automl(first)
+
+        if early_stop:
+            interim = _validation_score(aml.leader, primary_metric(task))
+            stopped = early_stop.should_stop(interim)
+            stop_report = early_stop.report(time_limit, stopped, interim=interim)
+            if stopped:
+                log.info(f"H2O did not beat the baseline, stopping after {first}s")
+            elif rest:
+                aml = automl(rest)
+
+        lb_df = aml.leaderboard.as_data_frame()
+
+        leaderboard, _, cm = evaluate_leaderboard(
+            lb_df["model_id"].tolist(), y_true, task, predict=predict
         )
-        t.start()
-
-    train = h2o.H2OFrame(train_df)
-    test = h2o.H2OFrame(test_df)
-
-    if task == "classification":
-        train[target] = train[target].asfactor()
-        test[target] = test[target].asfactor()
-
-    aml = H2OAutoML(
-        max_runtime_secs=time_limit,
-        exclude_algos=["DeepLearning"],
-        verbosity="info"
-    )
 
-    aml.train(y=target, training_frame=train)
+        validation_score = _validation_score(aml.leader, primary_metric(task))
 
-    stop_flag["stop"] = True
+        if artifact_dir and leaderboard:
+            with span("persist"):
+                h2o.save_model(
+                    h2o.get_model(leaderboard[0]["model_id"]),
+                    path=os.path.abspath(artifact_dir), filename="model", force=True
+                )
 
-    lb_df = aml.leaderboard.as_data_frame()
-    model_ids = lb_df["model_id"].tolist()[:5]
+    finally:
+        if follower:
+            follower.stop()
+        release(train, test, *runs)
 
-    y_true = test_df[target].values
-    leaderboard = []
+    return {
+        "skipped": False,
+        "ingest_sec": ingest_sec,
+        "metrics": leaderboard[0] if leaderboard else {},
+        "leaderboard": leaderboard,
+        "confusion_matrix": cm,
+        "validation_score": validation_score,
+        "early_stop": stop_report
+    }
 
-    for model_id in model_ids:
-        model = h2o.get_model(model_id)
-        preds = model.predict(test).as_data_frame().iloc[:, 0]
 
-        acc = float(accuracy_score(y_true, preds))
-        prec = float(precision_score(y_true, preds, average="weighted", zero_division=0))
-        rec = float(recall_score(y_true, preds, average="weighted", zero_division=0))
-        f1 = float(f1_score(y_true, preds, average="weighted", zero_division=0))
+def load_model(artifact_dir):
+    get_session()
+    return h2o.load_model(os.path.abspath(os.path.join(artifact_dir, "model")))
 
-        leaderboard.append({
-            "model_id": model_id,
-            "accuracy": round(acc, 4),
-            "precision_weighted": round(prec, 4),
-            "recall_weighted": round(rec, 4),
-            "f1_weighted": round(f1, 4)
-        })
 
-    best = leaderboard[0]
+def predict_model(model, X):
+    frame = pred_frame = None
+    try:
+        frame = h2o.H2OFrame(X)
+        pred_frame = model.predict(frame)
+        return pred_frame.as_data_frame().iloc[:, 0].values
+    finally:
+        release(frame, pred_frame)
 
-    best_preds = h2o.get_model(best["model_id"]).predict(test).as_data_frame().iloc[:, 0]
-    labels = sorted(set(y_true))
-    cm = confusion_matrix(y_true, best_preds, labels=labels)
 
-    return {
-        "skipped": False,
-        "metrics": best,
-        "leaderboard": leaderboard,
-        "confusion_matrix": {
-            "labels": labels,
-            "matrix": cm.tolist()
-        }
-    }
+def unload_model(model):
+    release(model)
@@ -0,0 +1,61 @@
+import threading
+
+import h2o
+import psutil
+
+from backend import config
+from .logger import setup_logger
+
+log = setup_logger("H2O")
+
+_lock = threading.Lock()
+
+
+def _max_mem_size(resources=None):
+    if resources and resources.get("mem_gb"):
+        return f"{max(1, int(resources['mem_gb']))}G"
+    if config.H2O_MAX_MEM:
+        return config.H2O_MAX_MEM
+    total_gb = psutil.virtual_memory().total / (1024 ** 3)
+    return f"{max(2, int(total_gb * config.H2O_MEM_FRACTION))}G"
+
+
+def _is_healthy():
+    try:
+        return h2o.connection() is not None and h2o.cluster().is_running()
+    except Exception:
+        return False
+
+
+def get_session(resources=None):
+    """
+    Connect to the shared H2O cluster, starting it on first use.
+    Later calls only health-check the existing connection, so the JVM
+    start/attach cost is paid once per worker process, not once per run.
+    `resources` (cpus / mem_gb) only applies when the JVM is started here.
+    """
+    with _lock:
+        if not _is_healthy():
+            nthreads = resources["cpus"] if resources else config.H2O_NTHREADS
+            max_mem = _max_mem_size(resources)
+            log.info(f"Starting H2O (nthreads={nthreads}, max_mem_size={max_mem})")
+            h2o.init(
+                nthreads=nthreads,
+                max_mem_size=max_mem,
+                verbose=False
+            )
+    return h2o
+
+
+def release(*objects):
+    """
+    Drop frames, models and AutoML projects from the cluster once a run
+    is done with them, so the JVM heap does not grow across jobs.
+    """
+    for obj in objects:
+        if obj is None:
+            continue
+        try:
+            h2o.remove(obj, cascade=True)
+        except Exception as e:
+            log.warning(f"Could not release H2O object: {e}")
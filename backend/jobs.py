@@ -0,0 +1,233 @@
+import asyncio
+import multiprocessing
+import multiprocessing.util
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend import config
+from backend.events import aiter_queue
+from backend.logger import setup_logger
+from backend.monitoring import ACTIVE_JOBS, QUEUE_DEPTH, mark_dead, record_process
+
+log = setup_logger("JOBS")
+
+_DONE = None
+
+
+class JobScheduler:
+    """
+    Runs blocking pipeline work in a process pool so the API event loop
+    stays free. At most `slots` jobs run at once, the rest queue (FIFO).
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._pool = None
+        self._manager = None
+        self._slots = None
+        self._jobs = {}
+        self._order = []
+        # the loop only keeps weak references to tasks
+        self._tasks = set()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.slots, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+
+    def _ensure_started(self):
+        if self._pool is not None:
+            return
+        self._pool = self._new_pool()
+        self._manager = multiprocessing.get_context("spawn").Manager()
+        self._slots = asyncio.Semaphore(self.slots)
+        log.info(f"Job pool started with {self.slots} slots")
+
+    async def submit(self, fn, *args, **meta):
+        """
+        Queue fn(*args, events=queue) and return its job id.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+
+        # a round trip to the manager process, kept off the event loop
+        events = await loop.run_in_executor(None, self._manager.Queue)
+        job_id = self._add(status="queued", **meta, _events=events, _readers=0)
+        QUEUE_DEPTH.inc()
+
+        task = loop.create_task(self._run(job_id, fn, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        log.info(f"Queued job {job_id} ({self.queue_depth()} waiting)")
+        return job_id
+
+    def complete(self, result, **meta):
+        """
+        Record a job whose result is already known (a memoized run): it
+        never queues or takes a slot. Returns its job id.
+        """
+        job_id = self._add(status="completed", result=result, **meta)
+        job = self._jobs[job_id]
+        job["started_at"] = job["finished_at"] = job["submitted_at"]
+        log.info(f"Job {job_id} completed from the memo")
+        return job_id
+
+    def _add(self, status, result=None, **meta):
+        job_id = uuid.uuid4().hex[:12]
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "status": status,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": result,
+            "error": None,
+            **meta,
+        }
+        self._order.append(job_id)
+        self._prune()
+        return job_id
+
+    async def _run(self, job_id, fn, args):
+        job = self._jobs[job_id]
+        events = job["_events"]
+
+        async with self._slots:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            loop = asyncio.get_running_loop()
+
+            engines = [e for e in job.get("engine", "").split(",") if e]
+            QUEUE_DEPTH.dec()
+            for engine in engines:
+                ACTIVE_JOBS.labels(engine=engine).inc()
+
+            pool = self._pool
+            try:
+                job["result"] = await loop.run_in_executor(pool, _call, fn, args, events)
+                job["status"] = "completed"
+            except BrokenProcessPool as e:
+                log.error(f"Job {job_id} failed: a worker died ({e})")
+                job["status"] = "failed"
+                job["error"] = f"Worker process died: {e}"
+                self._replace_pool(pool)
+            except Exception as e:
+                log.error(f"Job {job_id} failed: {e}")
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = time.time()
+                for engine in engines:
+                    ACTIVE_JOBS.labels(engine=engine).dec()
+                # one sentinel per attached stream; nobody else will read
+                readers = job["_readers"]
+                if readers:
+                    await loop.run_in_executor(None, _put_done, events, readers)
+                self._release_events(job)
+
+    def _release_events(self, job):
+        """
+        Drop a finished job's event queue once no stream reads it, so the
+        events of jobs nobody watches (POST /jobs) are not kept in the
+        manager process until the job leaves JOB_HISTORY.
+        """
+        if job["finished_at"] is not None and not job.get("_readers"):
+            job.pop("_events", None)
+
+    def _replace_pool(self, broken):
+        """
+        Swap a pool whose worker was killed (OOM, segfault) for a fresh
+        one; every job still on it fails with BrokenProcessPool too, and
+        only the first of them rebuilds.
+        """
+        if self._pool is not broken:
+            return
+        log.warning("Job pool broken, starting a new one")
+        # killed workers never ran their exit hook
+        mark_dead(list(broken._processes or ()))
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+
+    async def stream(self, job_id):
+        """
+        Yield progress events published by the job until it finishes.
+        Returns at once for finished (or memoized) jobs.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job["finished_at"] is not None or "_events" not in job:
+            return
+
+        job["_readers"] += 1
+        try:
+            async for event in aiter_queue(job["_events"], _DONE):
+                yield event
+        finally:
+            job["_readers"] -= 1
+            self._release_events(job)
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        public = {k: v for k, v in job.items() if not k.startswith("_")}
+        if job["status"] == "queued":
+            waiting = [j for j in self._order if self._jobs[j]["status"] == "queued"]
+            public["queue_position"] = waiting.index(job_id) + 1
+        return public
+
+    def list(self):
+        return [
+            {k: v for k, v in self.get(j).items() if k != "result"}
+            for j in reversed(self._order)
+        ]
+
+    def busy(self):
+        running = sum(1 for j in self._jobs.values() if j["status"] == "running")
+        return running + self.queue_depth() >= self.slots
+
+    def queue_depth(self):
+        return sum(1 for j in self._jobs.values() if j["status"] == "queued")
+
+    def _prune(self):
+        finished = [
+            j for j in self._order
+            if self._jobs[j]["status"] in ("completed", "failed")
+        ]
+        for job_id in finished[:max(0, len(finished) - config.JOB_HISTORY)]:
+            self._order.remove(job_id)
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        if self._pool is not None:
+            # worker gauges would otherwise outlive the workers
+            mark_dead(list(self._pool._processes or ()))
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+def _put_done(events, count):
+    for _ in range(count):
+        events.put(_DONE)
+
+
+def _init_worker():
+    # drop this worker's live gauges from the sums when it exits
+    multiprocessing.util.Finalize(None, mark_dead, exitpriority=0)
+
+
+def _call(fn, args, events):
+    record_process()
+    try:
+        return fn(*args, events=events)
+    finally:
+        record_process()
+
+
+scheduler = JobScheduler(config.JOB_SLOTS)
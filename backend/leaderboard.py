@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import config
+from .metrics import evaluate
+from .logger import setup_logger
+from .tracing import span
+
+log = setup_logger("LEADERBOARD")
+
+
+def evaluate_leaderboard(model_ids, y_true, task, predict=None, predict_many=None):
+    """
+    Score the top-k models of an engine with exactly one prediction each.
+
+    predict_many(model_ids) -> {model_id: preds} is used when the engine
+    can score several models in one pass; otherwise predict(model_id) is
+    fanned out over a thread pool. Returns the leaderboard, the cached
+    predictions and the best model's confusion matrix (classification).
+    """
+    with span("leaderboard"):
+        model_ids = list(model_ids)[:config.LEADERBOARD_TOP_K]
+        if not model_ids:
+            return [], {}, None
+
+        if predict_many is not None:
+            predictions = predict_many(model_ids)
+        else:
+            workers = max(1, min(config.SCORING_THREADS, len(model_ids)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                predictions = dict(zip(model_ids, pool.map(predict, model_ids)))
+
+        # one batched call: every metric and confusion matrix comes from
+        # a single integer encoding of the cached predictions
+        scores, confusions = evaluate(
+            task, y_true, [predictions[model_id] for model_id in model_ids]
+        )
+        leaderboard = [
+            {"model_id": model_id, **score}
+            for model_id, score in zip(model_ids, scores)
+        ]
+        cm = confusions[0] if confusions else None
+
+        log.info(f"Scored {len(model_ids)} leaderboard models")
+        return leaderboard, predictions, cm
@@ -0,0 +1,51 @@
+import hashlib
+import json
+
+from backend import config
+from backend.artifacts import delete_artifacts
+from backend.compare.registry import find_memo, save_memo
+from backend.dataset_cache import content_hash
+from backend.engines import engine_version
+from backend.splitter import TEST_SIZE, RANDOM_STATE
+from .logger import setup_logger
+
+log = setup_logger("MEMO")
+
+
+def run_fingerprint(path: str, engine: str, time_limit: int, variant=None) -> str:
+    """
+    Content address of a run: identical bytes, engine version, split
+    parameters, budget and early-stop rule produce the same fingerprint.
+    `variant` tells apart runs trained differently (progressive mode).
+    """
+    key = {
+        "dataset_sha256": content_hash(path),
+        "engine": engine,
+        "engine_version": engine_version(engine),
+        "split": {"test_size": TEST_SIZE, "random_state": RANDOM_STATE},
+        "time_limit": time_limit,
+        "early_stop": (
+            [config.EARLY_STOP_FRACTION, config.EARLY_STOP_MARGIN] if config.EARLY_STOP else None
+        ),
+    }
+    if variant is not None:
+        key["variant"] = variant
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def lookup(fingerprint: str):
+    entry = find_memo(fingerprint)
+    if entry is not None:
+        log.info(f"Memo hit {fingerprint[:12]} ({entry.get('dataset')}/{entry.get('tool')})")
+    return entry
+
+
+def remember(fingerprint: str, result_id: int):
+    evicted, deleted_runs = save_memo(fingerprint, result_id, config.MEMO_MAX_ENTRIES)
+    if evicted:
+        log.info(f"Evicted {len(evicted)} memo entries")
+    # saved models of results dropped with their memo go too
+    run_ids = [r for r in deleted_runs if r]
+    if run_ids:
+        delete_artifacts(run_ids)
+    return evicted
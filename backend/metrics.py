@@ -1,8 +1,131 @@
+import numpy as np
 from .logger import setup_logger
+from .tracing import span
 
 log = setup_logger("METRIC")
 
+# error metrics; every other metric is a score
+LOWER_IS_BETTER = ("rmse", "mae")
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric not in LOWER_IS_BETTER
+
+
+def primary_metric(task: str) -> str:
+    """
+    Metric engines are ranked by.
+    """
+    return "accuracy" if task == "classification" else "rmse"
+
+
 def select_metrics(task: str):
     if task == "classification":
         return ["accuracy", "precision_weighted", "recall_weighted", "f1_weighted"]
     return ["rmse", "mae", "r2"]
+
+
+def _encode(y_true, preds):
+    """
+    Integer-encode y_true and every prediction vector against one
+    shared label set. Returns (labels, true_codes, pred_codes[k, n]).
+    """
+    values = np.concatenate([y_true, preds.ravel()])
+    try:
+        labels, codes = np.unique(values, return_inverse=True)
+    except TypeError:
+        # mixed label types (e.g. ints vs strings) -> compare as text
+        labels, codes = np.unique(values.astype(str), return_inverse=True)
+
+    n = y_true.shape[0]
+    return labels, codes[:n], codes[n:].reshape(preds.shape)
+
+
+def _classification(y_true, preds):
+    labels, t, p = _encode(y_true, preds)
+    k, n = p.shape
+    n_labels = len(labels)
+
+    # all k confusion matrices from a single bincount
+    flat = (np.arange(k)[:, None] * n_labels + t[None, :]) * n_labels + p
+    cms = np.bincount(flat.ravel(), minlength=k * n_labels * n_labels)
+    cms = cms.reshape(k, n_labels, n_labels)
+
+    tp = np.diagonal(cms, axis1=1, axis2=2)
+    support = cms.sum(axis=2)
+    predicted = cms.sum(axis=1)
+
+    # zero_division=0 semantics, matching sklearn's weighted averages
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        pr_sum = precision + recall
+        f1 = np.where(pr_sum > 0, 2 * precision * recall / pr_sum, 0.0)
+
+    weights = support / n
+    columns = {
+        "accuracy": tp.sum(axis=1) / n,
+        "precision_weighted": (precision * weights).sum(axis=1),
+        "recall_weighted": (recall * weights).sum(axis=1),
+        "f1_weighted": (f1 * weights).sum(axis=1),
+    }
+
+    # report the matrix over the labels that occur in y_true
+    present = np.unique(t)
+    confusions = [
+        {
+            "labels": labels[present].tolist(),
+            "matrix": cm[np.ix_(present, present)].tolist(),
+        }
+        for cm in cms
+    ]
+    return columns, confusions
+
+
+def _regression(y_true, preds):
+    y_true = y_true.astype(float)
+    err = preds.astype(float) - y_true[None, :]
+    sq = err ** 2
+
+    ss_res = sq.sum(axis=1)
+    ss_tot = ((y_true - y_true.mean()) ** 2).sum()
+    if ss_tot > 0:
+        r2 = 1.0 - ss_res / ss_tot
+    else:
+        r2 = np.where(ss_res == 0, 1.0, 0.0)
+
+    columns = {
+        "rmse": np.sqrt(sq.mean(axis=1)),
+        "mae": np.abs(err).mean(axis=1),
+        "r2": r2,
+    }
+    return columns, None
+
+
+def evaluate(task: str, y_true, predictions):
+    """
+    Score many prediction vectors against y_true in one vectorized pass.
+
+    Returns (scores, confusions): one metrics dict per vector (keys from
+    select_metrics) and, for classification, one confusion matrix per
+    vector; confusions is None for regression.
+    """
+    y_true = np.asarray(y_true)
+    preds = np.stack([np.asarray(p) for p in predictions])
+
+    if task == "classification":
+        columns, confusions = _classification(y_true, preds)
+    else:
+        columns, confusions = _regression(y_true, preds)
+
+    scores = [
+        {name: round(float(columns[name][i]), 4) for name in select_metrics(task)}
+        for i in range(preds.shape[0])
+    ]
+    return scores, confusions
+
+
+def score_predictions(task: str, y_true, preds):
+    with span("score"):
+        scores, _ = evaluate(task, y_true, [preds])
+    return scores[0]
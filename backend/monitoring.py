@@ -0,0 +1,137 @@
+import glob
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+
+import psutil
+
+from backend import config
+
+# prometheus_client picks multiprocess mode from this variable at import
+# time, so it has to be set first. Every uvicorn worker and job worker
+# writes its own files here and /metrics sums them.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", config.METRICS_DIR)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+# set by the process that launched the server; workers inherit it
+_LAUNCHER = "AUTOML_METRICS_LAUNCHER"
+
+
+def _reset_metrics_dir():
+    """
+    Remove the files of an earlier server run, so their counters and
+    gauges stop adding up in /metrics. Only the launching process does
+    this, before it starts any worker: job workers inherit _LAUNCHER and
+    processes started by a supervisor that never imported this module
+    (uvicorn --workers) leave the directory alone.
+    """
+    if _LAUNCHER in os.environ or multiprocessing.parent_process() is not None:
+        return
+    os.environ[_LAUNCHER] = str(os.getpid())
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+# before any metric below creates its file
+_reset_metrics_dir()
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess  # noqa: E402
+
+REQUEST_SECONDS = Histogram(
+    "automl_http_request_duration_seconds",
+    "API request latency",
+    ["method", "route", "status"],
+)
+QUEUE_DEPTH = Gauge(
+    "automl_job_queue_depth",
+    "Jobs waiting for a free slot",
+    multiprocess_mode="livesum",
+)
+ACTIVE_JOBS = Gauge(
+    "automl_active_jobs",
+    "Jobs currently running, per engine",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+RUN_SECONDS = Histogram(
+    "automl_run_duration_seconds",
+    "Engine training time",
+    ["engine", "task"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, float("inf")),
+)
+ROWS_LOADED = Counter(
+    "automl_dataset_rows_loaded",
+    "Dataset rows loaded (rate over load seconds gives rows/s)",
+    ["source"],
+)
+LOAD_SECONDS = Counter(
+    "automl_dataset_load_seconds",
+    "Time spent loading datasets",
+    ["source"],
+)
+REGISTRY_SECONDS = Histogram(
+    "automl_registry_duration_seconds",
+    "Results registry read/write latency",
+    ["op"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, float("inf")),
+)
+PROCESS_RSS = Gauge(
+    "automl_process_resident_memory_bytes",
+    "Resident memory of the API and job worker processes",
+    multiprocess_mode="livesum",
+)
+PROCESS_CPU = Gauge(
+    "automl_process_cpu_seconds",
+    "CPU time used by the API and job worker processes",
+    multiprocess_mode="livesum",
+)
+
+_process = psutil.Process()
+
+
+@contextmanager
+def timed(histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def record_load(source, rows, seconds):
+    ROWS_LOADED.labels(source=source).inc(rows)
+    LOAD_SECONDS.labels(source=source).inc(seconds)
+
+
+def record_process():
+    """
+    Refresh this process's CPU/RSS gauges.
+    """
+    try:
+        times = _process.cpu_times()
+        PROCESS_CPU.set(times.user + times.system)
+        PROCESS_RSS.set(_process.memory_info().rss)
+    except psutil.Error:
+        pass
+
+
+def mark_dead(pids=None):
+    """
+    Drop the live gauges of exited processes (default: this one) from the sums.
+    """
+    for pid in pids or [os.getpid()]:
+        multiprocess.mark_process_dead(pid)
+
+
+def exposition():
+    """
+    (body, content type) of all processes' metrics in text format.
+    """
+    record_process()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,62 +1,627 @@
-from backend.data_loader import load_dataset
-from backend.splitter import split_data
-from backend.task_detector import detect_task
-from backend.h2o_runner import run_h2o
-from backend.autogluon_runner import run_autogluon
-from backend.tpot_runner import run_tpot
-from backend.flaml_runner import run_flaml
-from backend.system_stats import monitor_start, monitor_tick, monitor_end
+import asyncio
+import math
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import psutil
+
+from backend import config
+from backend.preprocess import prepare
+from backend.baseline import EarlyStop, train_baseline
+from backend.artifacts import (
+    PROFILES_DIR, new_run_id, artifact_dir, profile_path, write_manifest, delete_artifacts
+)
+from backend import tracing, warm_start
+from backend.events import RunEvents
+from backend.engines import ENGINES, TIME_LIMITS, get_runner, is_installed
+from backend.memo import run_fingerprint, lookup, remember
+from backend.system_stats import monitor_start, monitor_end
 from backend.compare.registry import save_result
+from backend.jobs import scheduler
+from backend.monitoring import RUN_SECONDS
+from backend.metrics import higher_is_better, primary_metric
 
+# how several engines share one run: all at once, or successive halving
+RUN_MODES = ("race", "progressive")
 
-async def run_pipeline(filename, engine):
-    yield {"type": "log", "message": f"Loading dataset: {filename}"}
 
-    df = load_dataset(f"datasets/{filename}")
-    task, target = detect_task(df)
+def resolve_engines(engine):
+    """
+    "h2o", "all", "h2o,flaml" or a list -> list of engine names.
+    "all" means every installed engine.
+    """
+    if isinstance(engine, str):
+        if engine == "all":
+            return [name for name in ENGINES if is_installed(name)]
+        engine = [e.strip() for e in engine.split(",") if e.strip()]
+
+    engines = list(dict.fromkeys(engine))
+    for name in engines:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine: {name}")
+        if not is_installed(name):
+            raise ValueError(f"Engine not installed: {name}")
+    if not engines:
+        raise ValueError("No engine selected")
+    return engines
+
+
+def allocate_resources(n_engines):
+    """
+    Even share of host cores and memory for each concurrently running
+    engine. Up to JOB_SLOTS jobs run at once, so each job only divides
+    its own 1/JOB_SLOTS of the host between its engines.
+    """
+    shares = n_engines * max(1, config.JOB_SLOTS)
+    total_gb = psutil.virtual_memory().total / (1024 ** 3)
+    return {
+        "cpus": max(1, (psutil.cpu_count() or 1) // shares),
+        "mem_gb": round(total_gb * config.RACE_MEM_FRACTION / shares, 1),
+    }
 
-    yield {"type": "log", "message": f"Detected task: {task}, target: {target}"}
 
-    X_train, X_test, y_train, y_test = split_data(df, target, task)
+def _prepare(filename, events):
+    with tracing.span("prepare"):
+        prep = prepare(f"datasets/{filename}")
 
-    train_df = X_train.copy()
-    train_df[target] = y_train
-    test_df = X_test.copy()
-    test_df[target] = y_test
+    events.log(f"Detected task: {prep.task}, target: {prep.target}")
+    if prep.meta["dropped"]:
+        events.log(f"Dropped leakage columns: {prep.meta['dropped']}")
 
-    monitor = monitor_start()
+    return prep
 
-    yield {"type": "log", "message": f"Starting {engine.upper()} AutoML"}
 
+def _baseline(prep, events):
+    """
+    Cheap linear reference score fitted before the engines; returns the
+    early-stop rule built on it, or None when early stopping is off.
+    """
+    if not config.EARLY_STOP:
+        return None
+
+    start = time.perf_counter()
+    data = prep
+    if prep.n_train > config.BASELINE_MAX_ROWS:
+        data = prep.sample(config.BASELINE_MAX_ROWS / prep.n_train)
+
+    try:
+        with tracing.span("baseline"):
+            X_train, _, y_train, _ = data.arrays()
+            metric, score = train_baseline(X_train, y_train, prep.task)
+    except Exception as e:
+        events.log(f"Baseline failed, early stopping disabled: {e}")
+        return None
+
+    events.log(
+        f"Baseline {metric}: {score:.4f} in {time.perf_counter() - start:.1f}s"
+    )
+    return EarlyStop(metric, score)
+
+
+def _engine_options(engine, prep, events):
+    """
+    Runner arguments only some engines take.
+    """
     if engine == "h2o":
-        raw = run_h2o(train_df, test_df, target, task)
-    elif engine == "autogluon":
-        raw = run_autogluon(train_df, test_df, target, task)
-    elif engine == "tpot":
-        raw = run_tpot(X_train, X_test, y_train, y_test, task)
-    elif engine == "flaml":
-        raw = run_flaml(X_train, X_test, y_train, y_test, task)
-    else:
-        yield {"type": "log", "message": "Unknown engine"}
-        return
+        # AutoML lines of the cluster log, forwarded as they are written;
+        # the splits are imported from Parquet kept in the prep cache
+        return {"log_callback": events.log, "parquet": prep.parquet_files()}
+
+    if engine == "flaml" and config.FLAML_WARM_START:
+        points, neighbours = warm_start.starting_points(prep)
+        if points:
+            names = ", ".join(n["dataset"] for n in neighbours)
+            events.log(f"FLAML warm start from configs of: {names}")
+        return {"starting_points": points}
+
+    return {}
+
+
+def _round(value, digits=4):
+    return round(float(value), digits) if value is not None else None
+
+
+def _train(filename, engine, prep, events, resources=None, time_limit=None, early_stop=None,
+           save_model=True, profile=False):
+    """
+    Fit one engine and build its result entry. The entry's spans time
+    ingest, fit (with scoring and persistence inside) and the manifest;
+    with `profile` the fit also runs under cProfile.
+    """
+    with tracing.recording() as spans:
+        entry = _fit(filename, engine, prep, events, resources, time_limit, early_stop,
+                     save_model, profile)
+    entry["spans"] = spans.summary()
+    return entry
+
+
+def _fit(filename, engine, prep, events, resources, time_limit, early_stop, save_model,
+         profile):
+    task, target = prep.task, prep.target
+    run_id = new_run_id()
+    model_dir = None
+    if save_model and config.SAVE_MODELS:
+        model_dir = artifact_dir(run_id)
+        os.makedirs(model_dir, exist_ok=True)
+
+    monitor = monitor_start(on_sample=events.stats)
+
+    events.log(f"Starting {engine.upper()} AutoML")
+
+    runner = get_runner(engine)
+    time_limit = time_limit or TIME_LIMITS[engine]
+    options = {
+        "time_limit": time_limit,
+        "resources": resources,
+        "early_stop": early_stop,
+        "artifact_dir": model_dir,
+        # models trained / best score so far, live on the run's stream
+        "on_progress": events.progress_reporter(time_limit),
+        **_engine_options(engine, prep, events),
+    }
+
+    profile = profile or config.PROFILE_RUNS
+    if profile:
+        os.makedirs(PROFILES_DIR, exist_ok=True)
 
-    monitor_tick(monitor)
-    system = monitor_end(monitor)
-    training_time_sec = system.get("elapsed_sec")
+    try:
+        with tracing.span("ingest"):
+            if engine in ("h2o", "autogluon"):
+                data = prep.frames() + (target,)
+            else:
+                data = prep.arrays()
+        with tracing.span("fit"), tracing.capture_profile(profile_path(run_id), profile):
+            raw = runner(*data, task, **options)
+    except Exception:
+        if model_dir:
+            delete_artifacts([run_id])
+        raise
+    finally:
+        system = monitor_end(monitor)
+
+    if "ingest_sec" in raw:
+        system["ingest_sec"] = raw["ingest_sec"]
+    training_time_sec = system.get("train_time_sec")
+    RUN_SECONDS.labels(engine=engine, task=task).observe(training_time_sec)
 
     leaderboard = raw.get("leaderboard", [])
     best_model = leaderboard[0]["model_id"] if leaderboard else "UNKNOWN"
 
-    entry = {
+    details = raw.get("details") or {}
+    best_configs = details.pop("best_config_per_estimator", None)
+    if best_configs and config.FLAML_WARM_START and prep.rows is None:
+        # configs found on a progressive sample are not stored
+        metric, _ = _rank_metric(task)
+        warm_start.remember(prep, filename, best_configs, raw.get("metrics", {}).get(metric))
+
+    model_bytes = None
+    if model_dir and os.listdir(model_dir):
+        with tracing.span("persist"):
+            model_bytes = write_manifest(run_id, engine, filename, best_model, prep)["bytes"]
+    elif model_dir:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    stop_report = raw.get("early_stop")
+    budget_saved_sec = stop_report["budget_saved_sec"] if stop_report else 0
+    cpus = resources["cpus"] if resources else psutil.cpu_count() or 1
+
+    return {
+        "run_id": run_id,
         "dataset": filename,
         "tool": engine,
         "task": task,
         "best_model": best_model,
+        "model_bytes": model_bytes,
         "metrics": raw.get("metrics", {}),
+        # the engine's own CV/holdout score of its leader (primary metric)
+        "validation_score": _round(raw.get("validation_score")),
         "training_time_sec": training_time_sec,
         "system": system,
-        "leaderboard": leaderboard
+        "leaderboard": leaderboard,
+        "confusion_matrix": raw.get("confusion_matrix"),
+        "details": details or None,
+        "early_stop": stop_report,
+        "budget_saved_sec": budget_saved_sec,
+        "cpu_hours_saved": round(budget_saved_sec * cpus / 3600, 4),
+        "profiled": profile,
     }
 
-    save_result(entry)
-    yield {"type": "result", "data": entry}
+
+def _fingerprint(filename, engine, variant=None):
+    return run_fingerprint(f"datasets/{filename}", engine, TIME_LIMITS[engine], variant)
+
+
+def _cached(fingerprint, engine, events):
+    entry = lookup(fingerprint)
+    if entry is not None:
+        events.log(f"{engine.upper()}: reusing result of an identical earlier run")
+        entry["cached"] = True
+    return entry
+
+
+def _save(entry, fingerprint):
+    entry["fingerprint"] = fingerprint
+    remember(fingerprint, save_result(entry))
+
+
+def execute_pipeline(filename, engine, events=None, force=False, profile=False):
+    """
+    Blocking pipeline body. Runs inside a scheduler worker process and
+    publishes log events to `events` while it works.
+    Identical earlier runs are returned from the memo unless `force`.
+    """
+    events = RunEvents.wrap(events)
+    fingerprint = _fingerprint(filename, engine)
+    if not force:
+        cached = _cached(fingerprint, engine, events)
+        if cached is not None:
+            return cached
+
+    with tracing.recording() as spans:
+        prep = _prepare(filename, events)
+        early_stop = _baseline(prep, events)
+    entry = _train(
+        filename, engine, prep, events, allocate_resources(1), early_stop=early_stop,
+        profile=profile
+    )
+    entry["spans"] = spans.summary() + entry["spans"]
+
+    _save(entry, fingerprint)
+    return entry
+
+
+def _race_worker(filename, engine, events, resources, fraction=None, time_limit=None,
+                 early_stop=None, profile=False):
+    # the preprocessing stage is already cached; this only reopens it
+    prep = prepare(f"datasets/{filename}")
+    if fraction is not None:
+        prep = prep.sample(fraction)
+    # models trained on a progressive sample are not worth keeping
+    return _train(
+        filename, engine, prep, events.for_engine(engine), resources, time_limit, early_stop,
+        save_model=fraction is None, profile=profile
+    )
+
+
+def execute_race(filename, engines, events=None, force=False, profile=False):
+    """
+    Preprocess once, then train every engine at the same time in
+    its own process with an even share of cores and memory.
+    Engines with a memoized identical run are not retrained unless `force`.
+    """
+    events = RunEvents.wrap(events)
+    race_start = time.perf_counter()
+    fingerprints = {engine: _fingerprint(filename, engine) for engine in engines}
+
+    cached = {}
+    if not force:
+        for engine in engines:
+            entry = _cached(fingerprints[engine], engine, events)
+            if entry is not None:
+                cached[engine] = entry
+
+    to_run = [engine for engine in engines if engine not in cached]
+    results, errors, resources = [], {}, None
+
+    if to_run:
+        with tracing.recording() as spans:
+            prep = _prepare(filename, events)
+            early_stop = _baseline(prep, events)
+        resources = allocate_resources(len(to_run))
+        results, errors = _race(
+            filename, to_run, events, resources, early_stop=early_stop, profile=profile
+        )
+        for entry in results:
+            entry["spans"] = spans.summary() + entry["spans"]
+
+    wall_clock_sec = round(time.perf_counter() - race_start, 2)
+
+    for entry in results:
+        entry["race"] = {
+            "engines": engines,
+            "wall_clock_sec": wall_clock_sec,
+            "resources": resources,
+        }
+        _save(entry, fingerprints[entry["tool"]])
+
+    return _race_result(filename, engines, cached, results, errors, wall_clock_sec)
+
+
+def _race_result(filename, engines, cached, results, errors, wall_clock_sec):
+    results = list(cached.values()) + results
+    return {
+        "mode": "race",
+        "dataset": filename,
+        "task": results[0]["task"] if results else None,
+        "engines": engines,
+        "wall_clock_sec": wall_clock_sec,
+        "engine_time_sec": {
+            e["tool"]: e["system"].get("train_time_sec") for e in results
+        },
+        "cached": list(cached),
+        "budget_saved_sec": sum(e.get("budget_saved_sec", 0) for e in results),
+        "cpu_hours_saved": round(sum(e.get("cpu_hours_saved", 0) for e in results), 4),
+        "errors": errors,
+        "results": results,
+    }
+
+
+def _race_pool(n_engines):
+    return ProcessPoolExecutor(
+        max_workers=n_engines, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _race(filename, engines, events, resources, fraction=None, time_limits=None,
+          early_stop=None, profile=False, pool=None):
+    """
+    Train `engines` side by side, one worker each, in `pool` (a pool of
+    its own if None). Returns (results, {engine: error}).
+    """
+    events.log(
+        f"Racing {', '.join(engines)} with {resources['cpus']} cpus / "
+        f"{resources['mem_gb']} GB each"
+    )
+    if pool is None:
+        with _race_pool(len(engines)) as pool:
+            return _race(filename, engines, events, resources, fraction, time_limits,
+                         early_stop, profile, pool)
+
+    results, errors, futures = [], {}, {}
+    for engine in engines:
+        try:
+            futures[engine] = pool.submit(
+                _race_worker, filename, engine, events, resources,
+                fraction, (time_limits or {}).get(engine), early_stop, profile
+            )
+        except BrokenProcessPool as e:
+            errors[engine] = str(e)
+    for engine, future in futures.items():
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors[engine] = str(e)
+            events.log(f"{engine.upper()} failed: {e}")
+
+    return results, errors
+
+
+def _rank_metric(task):
+    """
+    (metric, higher_is_better) used to rank engines between rungs.
+    """
+    metric = primary_metric(task)
+    return metric, higher_is_better(metric)
+
+
+def execute_progressive(filename, engines, events=None, profile=False):
+    """
+    Successive halving for large datasets. All engines train on growing
+    stratified samples (config.PROGRESSIVE_RUNGS), each rung with a slice
+    of their budget; after every rung only the best PROGRESSIVE_KEEP share
+    continues. Finalists spend the rest of their budget on the full split.
+    The rungs already prune engines, so the baseline early stop is not used.
+    Engines are ranked on their own validation scores; the sampled test
+    split is only reported. Every saved finalist records which engine
+    dropped out at which rung, with the eliminated engines' rung scores.
+    Not looked up in the memo: the budgets differ from a plain run of the
+    same engine.
+    """
+    events = RunEvents.wrap(events)
+    start = time.perf_counter()
+    with tracing.recording() as spans:
+        prep = _prepare(filename, events)
+    metric, higher_is_better = _rank_metric(prep.task)
+
+    alive = list(engines)
+    spent = dict.fromkeys(engines, 0)
+    dropped_at_rung = dict.fromkeys(engines)
+    history = {engine: [] for engine in engines}
+    errors = {}
+
+    rungs = [f for f in config.PROGRESSIVE_RUNGS if 0 < f < 1]
+    # one pool for every rung and the final race, so workers keep their
+    # imported frameworks (and H2O its JVM) from one rung to the next
+    pool = _race_pool(len(engines))
+    try:
+        for rung, fraction in enumerate(rungs):
+            if len(alive) <= 1:
+                break
+
+            rows = int(prep.n_train * fraction)
+            if rows < config.PROGRESSIVE_MIN_ROWS:
+                events.log(f"Rung {rung}: {rows} rows is below the minimum, skipped")
+                continue
+
+            limits = {
+                e: max(1, int(TIME_LIMITS[e] * config.PROGRESSIVE_RUNG_BUDGET)) for e in alive
+            }
+            events.log(f"Rung {rung}: {', '.join(alive)} on {rows} rows ({fraction:.0%})")
+
+            results, failed = _race(
+                filename, alive, events, allocate_resources(len(alive)),
+                fraction=fraction, time_limits=limits, pool=pool
+            )
+            errors.update(failed)
+            if pool._broken:
+                # a worker died (e.g. out of memory); later rungs need a new pool
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _race_pool(len(engines))
+
+            scores = {}
+            for entry in results:
+                engine = entry["tool"]
+                spent[engine] += limits[engine]
+                score = entry["validation_score"]
+                history[engine].append({
+                    "rung": rung,
+                    "fraction": fraction,
+                    "rows": rows,
+                    "time_limit": limits[engine],
+                    "train_time_sec": entry["system"].get("train_time_sec"),
+                    "validation_score": score,
+                    metric: entry["metrics"].get(metric),
+                })
+                if score is not None:
+                    scores[engine] = score
+
+            # failed or skipped engines (and any without a validation
+            # score) have no score and drop out here
+            ranked = sorted(scores, key=scores.get, reverse=higher_is_better)
+            survivors = ranked[:max(1, math.ceil(len(alive) * config.PROGRESSIVE_KEEP))]
+            for engine in alive:
+                if engine not in survivors:
+                    dropped_at_rung[engine] = rung
+            alive = survivors
+
+            events.log(f"Rung {rung}: {', '.join(alive) or 'no engine'} continue")
+
+        results = []
+        if alive:
+            limits = {e: max(1, TIME_LIMITS[e] - spent[e]) for e in alive}
+            results, failed = _race(
+                filename, alive, events, allocate_resources(len(alive)), time_limits=limits,
+                profile=profile, pool=pool
+            )
+            errors.update(failed)
+    finally:
+        pool.shutdown()
+
+    wall_clock_sec = round(time.perf_counter() - start, 2)
+    eliminated = {
+        engine: history[engine] for engine, rung in dropped_at_rung.items() if rung is not None
+    }
+
+    for entry in results:
+        engine = entry["tool"]
+        entry["progressive"] = {
+            "engines": engines,
+            "rank_metric": metric,
+            "wall_clock_sec": wall_clock_sec,
+            "final_time_limit": limits[engine],
+            "rungs": history[engine],
+            "dropped_at_rung": dropped_at_rung,
+            "eliminated": eliminated,
+        }
+        entry["spans"] = spans.summary() + entry["spans"]
+        # memoized under its own fingerprint, never looked up, so memo
+        # eviction also retires old progressive results and their models
+        _save(entry, _fingerprint(filename, engine, variant={
+            "progressive": {
+                "engines": engines,
+                "rungs": rungs,
+                "keep": config.PROGRESSIVE_KEEP,
+                "rung_budget": config.PROGRESSIVE_RUNG_BUDGET,
+            }
+        }))
+
+    return {
+        "mode": "progressive",
+        "dataset": filename,
+        "task": prep.task,
+        "engines": engines,
+        "rung_fractions": rungs,
+        "rank_metric": metric,
+        "wall_clock_sec": wall_clock_sec,
+        "dropped_at_rung": dropped_at_rung,
+        "rungs": history,
+        "errors": errors,
+        "results": results,
+    }
+
+
+def _execute(filename, engines, force, mode="race", profile=False, events=None):
+    # a profiled run has to train, a memoized result has no profile
+    force = force or profile
+    if len(engines) == 1:
+        return execute_pipeline(filename, engines[0], events=events, force=force, profile=profile)
+    if mode == "progressive":
+        return execute_progressive(filename, engines, events=events, profile=profile)
+    return execute_race(filename, engines, events=events, force=force, profile=profile)
+
+
+def _memoized(filename, engines, force, mode, profile):
+    """
+    What _execute would return when every engine has a memoized identical
+    run, or None when something has to train (progressive runs always do).
+    """
+    if force or profile or (len(engines) > 1 and mode == "progressive"):
+        return None
+
+    cached = {}
+    for engine in engines:
+        try:
+            entry = _cached(_fingerprint(filename, engine), engine, RunEvents())
+        except OSError:
+            return None  # missing dataset: the job reports it
+        if entry is None:
+            return None
+        cached[engine] = entry
+
+    if len(engines) == 1:
+        return cached[engines[0]]
+    return _race_result(filename, engines, cached, [], {}, 0.0)
+
+
+def _check_mode(mode):
+    if mode not in RUN_MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+
+
+async def submit_pipeline(filename, engine, force=False, mode="race", profile=False):
+    """
+    Queue a pipeline run on the job scheduler and return its job id.
+    Several engines (a list, "a,b" or "all") run as one job, either racing
+    each other or, with mode="progressive", by successive halving.
+    A run that is fully memoized completes at once without queueing.
+    `force` retrains even when an identical run is memoized; `profile`
+    also saves a cProfile of every engine fit.
+    """
+    _check_mode(mode)
+    engines = resolve_engines(engine)
+    meta = {"dataset": filename, "engine": ",".join(engines), "mode": mode}
+
+    # hashing and the registry lookup block, so off the event loop
+    cached = await asyncio.to_thread(_memoized, filename, engines, force, mode, profile)
+    if cached is not None:
+        return scheduler.complete(cached, **meta)
+
+    return await scheduler.submit(_execute, filename, engines, force, mode, profile, **meta)
+
+
+async def run_pipeline(filename, engine, force=False, mode="race", profile=False):
+    yield {"type": "log", "message": f"Loading dataset: {filename}"}
+
+    try:
+        _check_mode(mode)
+        resolve_engines(engine)
+    except ValueError as e:
+        yield {"type": "log", "message": str(e)}
+        return
+
+    busy = scheduler.busy()
+    job_id = await submit_pipeline(filename, engine, force=force, mode=mode, profile=profile)
+    job = scheduler.get(job_id)
+
+    yield {"type": "job", "job_id": job_id, "status": job["status"]}
+    if job["status"] == "completed":
+        yield {"type": "log", "message": "Reusing the result of an identical earlier run"}
+    elif busy:
+        yield {
+            "type": "log",
+            "message": f"All slots busy, job {job_id} queued at position {job['queue_position']}"
+        }
+
+    async for event in scheduler.stream(job_id):
+        yield event
+
+    job = scheduler.get(job_id)
+    if job["status"] != "completed":
+        yield {"type": "log", "message": f"Job {job_id} failed: {job['error']}"}
+        return
+
+    yield {"type": "result", "data": {**job["result"], "job_id": job_id}}
@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from backend import config
+from backend.data_loader import load_dataset
+from backend.dataset_cache import (
+    CACHE_DIR, content_hash, frame_table, is_fresh, read_table, write_ipc
+)
+from backend.profiler import load_profile
+from backend.splitter import (
+    TEST_SIZE, RANDOM_STATE, detect_leakage_columns, sample_indices, split_indices
+)
+from backend.task_detector import detect_task
+from backend.tracing import span
+from .logger import setup_logger
+
+log = setup_logger("PREP")
+
+PREP_DIR = os.path.join(CACHE_DIR, "prep")
+# bump when the artifact layout or encoding changes
+PREP_VERSION = 3
+
+
+def _prep_key(path: str) -> str:
+    key = {
+        "dataset_sha256": content_hash(path),
+        "test_size": TEST_SIZE,
+        "random_state": RANDOM_STATE,
+        "version": PREP_VERSION,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _encode_column(col: pd.Series):
+    """
+    Numeric/bool -> float64 (NaN kept for the caller to fill),
+    datetimes -> epoch ns, anything else -> category codes with missing
+    values as one extra code. Returns (values, categories).
+    """
+    if pd.api.types.is_bool_dtype(col) or pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy(dtype=np.float64, na_value=np.nan), None
+
+    if pd.api.types.is_datetime64_any_dtype(col):
+        values = col.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        values[col.isna().to_numpy()] = np.nan
+        return values, None
+
+    cat = pd.Categorical(col)
+    values = cat.codes.astype(np.float64)
+    values[cat.codes < 0] = len(cat.categories)
+    return values, cat.categories.tolist()
+
+
+def _fill_value(values):
+    """
+    Training median used for missing numeric values (0 if all missing).
+    """
+    if np.isnan(values).all():
+        return 0.0
+    return float(np.nanmedian(values))
+
+
+def encode_features(df: pd.DataFrame, meta: dict) -> np.ndarray:
+    """
+    Encode new rows (e.g. a scoring batch) exactly like the training
+    matrix: same feature order, same category codes and fill values;
+    unseen categories share the missing-value code.
+    """
+    out = np.empty((len(df), len(meta["features"])), dtype=np.float64)
+    for i, c in enumerate(meta["features"]):
+        col = df[c]
+        categories = meta["categories"].get(str(c))
+        if categories is None:
+            values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            out[:, i] = np.where(np.isnan(values), meta["fill"][str(c)], values)
+            continue
+        # compared as text: a chunk may parse a column with a different dtype
+        codes = pd.Categorical(
+            col.astype(str).where(col.notna()), categories=[str(v) for v in categories]
+        ).codes
+        out[:, i] = np.where(codes < 0, len(categories), codes)
+    return out
+
+
+def _save_rows(directory, name, values, train_idx, test_idx):
+    np.save(os.path.join(directory, f"{name}_train.npy"), values[train_idx])
+    np.save(os.path.join(directory, f"{name}_test.npy"), values[test_idx])
+
+
+def _write_matrices(df, features, train_idx, test_idx, directory):
+    # encoded feature matrices, filled one column at a time so peak
+    # memory stays at one full column plus the two output files
+    shapes = {"train": len(train_idx), "test": len(test_idx)}
+    matrices = {
+        name: np.lib.format.open_memmap(
+            os.path.join(directory, f"X_{name}.npy"), mode="w+",
+            dtype=np.float64, shape=(rows, len(features)), fortran_order=True
+        )
+        for name, rows in shapes.items()
+    }
+    categories, fill = {}, {}
+    for i, c in enumerate(features):
+        values, cats = _encode_column(df[c])
+        if cats is not None:
+            categories[str(c)] = cats
+        else:
+            # numeric gaps get the training median, like the engines'
+            # own frame preprocessing would
+            fill[str(c)] = _fill_value(values[train_idx])
+            values = np.where(np.isnan(values), fill[str(c)], values)
+        matrices["train"][:, i] = values[train_idx]
+        matrices["test"][:, i] = values[test_idx]
+    for m in matrices.values():
+        m.flush()
+    del matrices
+    return categories, fill
+
+
+def _build(path: str, directory: str):
+    with span("load"):
+        df = load_dataset(path)
+    with span("detect_task"):
+        task, target = detect_task(df)
+
+    with span("leakage_drop"):
+        dropped = detect_leakage_columns(df, target, profile=load_profile(path))
+    if dropped:
+        log.warning(f"Dropped leakage columns: {dropped}")
+    features = [c for c in df.columns if c != target and c not in dropped]
+
+    y = df[target]
+    with span("split"):
+        train_idx, test_idx = split_indices(y, task)
+
+        np.save(os.path.join(directory, "train_idx.npy"), train_idx)
+        np.save(os.path.join(directory, "test_idx.npy"), test_idx)
+
+        # split frames taken straight from the Arrow cache (load_dataset above
+        # left it fresh unless the CSV did not fit one), so frame engines
+        # can memory-map them later
+        if is_fresh(path):
+            table = read_table(path, columns=[str(c) for c in features] + [str(target)])
+        else:
+            table = frame_table(df[features + [target]])
+        for name, idx in (("train", train_idx), ("test", test_idx)):
+            write_ipc(table.take(idx), os.path.join(directory, f"{name}.arrow"))
+        del table
+
+    with span("encode"):
+        categories, fill = _write_matrices(df, features, train_idx, test_idx, directory)
+
+    classes = None
+    if task == "classification":
+        cat = pd.Categorical(y)
+        classes = cat.categories.tolist()
+        _save_rows(directory, "y", cat.codes.astype(np.int32), train_idx, test_idx)
+    else:
+        _save_rows(directory, "y", y.to_numpy(dtype=np.float64), train_idx, test_idx)
+
+    meta = {
+        "source": os.path.basename(path),
+        "task": task,
+        "target": target,
+        "dropped": dropped,
+        "features": features,
+        "categories": categories,
+        "fill": fill,
+        "classes": classes,
+        "n_train": len(train_idx),
+        "n_test": len(test_idx),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    return meta
+
+
+class PreparedData:
+    """
+    Cached preprocessing artifacts of one dataset: leakage-free feature
+    list, split indices, encoded (NaN-free) matrices and split frames. Everything is
+    memory-mapped from disk on first access, so several workers opening
+    the same dataset share one copy in the page cache.
+
+    `rows` = (train positions, test positions) restricts the handle to a
+    sample of both splits; see sample().
+    """
+
+    def __init__(self, path: str, directory: str, meta: dict, rows=None):
+        self.path = path
+        self.directory = directory
+        self.meta = meta
+        self.rows = rows
+        self._frames = None
+
+    @property
+    def task(self):
+        return self.meta["task"]
+
+    @property
+    def target(self):
+        return self.meta["target"]
+
+    @property
+    def features(self):
+        return self.meta["features"]
+
+    def _load(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def _labels(self, codes):
+        if self.meta["classes"] is None:
+            return codes
+        return np.asarray(self.meta["classes"])[codes]
+
+    @property
+    def n_train(self):
+        return self.meta["n_train"] if self.rows is None else len(self.rows[0])
+
+    def class_counts(self):
+        """
+        Rows per class in the training split (classification only).
+        """
+        codes = self._load("y_train")
+        if self.rows is not None:
+            codes = codes[self.rows[0]]
+        return np.bincount(codes, minlength=len(self.meta["classes"]))
+
+    def sample(self, fraction: float) -> "PreparedData":
+        """
+        Handle on a stratified `fraction` of both splits.
+        """
+        rows = (
+            sample_indices(self._load("y_train"), self.task, fraction),
+            sample_indices(self._load("y_test"), self.task, fraction),
+        )
+        return PreparedData(self.path, self.directory, self.meta, rows=rows)
+
+    def arrays(self):
+        """
+        Encoded (X_train, X_test, y_train, y_test) for NumPy engines.
+        """
+        X_train, X_test = self._load("X_train"), self._load("X_test")
+        y_train, y_test = self._load("y_train"), self._load("y_test")
+        if self.rows is not None:
+            train_rows, test_rows = self.rows
+            X_train, y_train = X_train[train_rows], y_train[train_rows]
+            X_test, y_test = X_test[test_rows], y_test[test_rows]
+        return X_train, X_test, self._labels(y_train), self._labels(y_test)
+
+    def _frame(self, name):
+        table = feather.read_table(
+            os.path.join(self.directory, f"{name}.arrow"), memory_map=True
+        )
+        # one record batch + split_blocks: null-free numeric columns stay
+        # views on the map instead of being copied into pandas blocks
+        return table.to_pandas(split_blocks=True)
+
+    def parquet_files(self):
+        """
+        Absolute paths of the train/test splits as Parquet, for engines
+        that import files themselves (H2O). Written next to the Arrow
+        splits on first call and shared by later runs; None for samples.
+        """
+        if self.rows is not None:
+            return None
+        paths = []
+        for name in ("train", "test"):
+            path = os.path.abspath(os.path.join(self.directory, f"{name}.parquet"))
+            if not os.path.exists(path):
+                table = feather.read_table(
+                    os.path.join(self.directory, f"{name}.arrow"), memory_map=True
+                )
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".parquet.tmp")
+                os.close(fd)
+                try:
+                    pq.write_table(table, tmp_path)
+                    os.replace(tmp_path, path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            paths.append(path)
+        return tuple(paths)
+
+    def frames(self):
+        """
+        (train_df, test_df) with the original column types for frame
+        engines. Built on first call and reused afterwards.
+        """
+        if self._frames is None:
+            train_df, test_df = self._frame("train"), self._frame("test")
+            if self.rows is not None:
+                train_rows, test_rows = self.rows
+                train_df = train_df.iloc[train_rows].reset_index(drop=True)
+                test_df = test_df.iloc[test_rows].reset_index(drop=True)
+            self._frames = train_df, test_df
+        return self._frames
+
+
+def _dir_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def _evict(keep: str):
+    """
+    Remove the least recently used prep directories (by mtime, which
+    prepare() bumps on every use) until the cache fits PREP_CACHE_BYTES.
+    `keep`, the directory being used, always stays.
+    """
+    entries = []
+    for name in os.listdir(PREP_DIR):
+        directory = os.path.join(PREP_DIR, name)
+        # dot-names are builds in progress or evictions underway
+        if name.startswith(".") or not os.path.isdir(directory):
+            continue
+        entries.append((os.path.getmtime(directory), directory, _dir_bytes(directory)))
+
+    total = sum(size for _, _, size in entries)
+    for _, directory, size in sorted(entries):
+        if total <= config.PREP_CACHE_BYTES:
+            break
+        if directory == keep:
+            continue
+        # renamed first so no reader sees a half-deleted directory
+        trash = os.path.join(PREP_DIR, f".evict_{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(directory, trash)
+        except OSError:
+            continue  # evicted by another worker already
+        shutil.rmtree(trash, ignore_errors=True)
+        total -= size
+        log.info(f"Evicted prep cache {os.path.basename(directory)} ({size / 1024 ** 2:.0f} MB)")
+
+
+def prepare(path: str) -> PreparedData:
+    """
+    Preprocess a dataset once per content fingerprint; later calls (from
+    any engine or worker process) reuse the cached artifacts. A new build
+    evicts least recently used ones beyond PREP_CACHE_BYTES.
+    """
+    directory = os.path.join(PREP_DIR, _prep_key(path))
+    meta_path = os.path.join(directory, "meta.json")
+
+    if not os.path.exists(meta_path):
+        os.makedirs(PREP_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".build_", dir=PREP_DIR)
+        try:
+            _build(path, tmp_dir)
+            os.rename(tmp_dir, directory)
+            log.info(f"Preprocessed {os.path.basename(path)} -> {directory}")
+            _evict(keep=directory)
+        except OSError:
+            # another worker finished the same build first
+            if not os.path.exists(meta_path):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    os.utime(directory)
+    return PreparedData(path, directory, meta)
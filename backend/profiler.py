@@ -0,0 +1,206 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from backend import config
+from backend.dataset_cache import NA_VALUES, fingerprint
+
+BOOL_VALUES = ["true", "false"]
+
+# dtype lattice: a column only ever moves to a wider kind
+_WIDEN = {
+    (None, "int"): "int", (None, "float"): "float",
+    (None, "bool"): "bool", (None, "string"): "string",
+    ("int", "float"): "float", ("float", "int"): "float",
+}
+_PANDAS_DTYPES = {
+    "int": "int64", "float": "float64", "bool": "bool",
+    "string": "object", None: "float64",
+}
+
+SKETCH_SIZE = 1024
+_HASH_SPACE = 2 ** 64
+
+
+# values tried before casting a whole batch; a failed full cast is slow
+_KIND_PROBE = 64
+
+
+def _cast(values: pa.Array, arrow_type):
+    """
+    values cast to arrow_type, or None if any of them does not parse.
+    """
+    try:
+        pc.cast(values.slice(0, _KIND_PROBE), arrow_type)
+        return pc.cast(values, arrow_type)
+    except pa.ArrowInvalid:
+        return None
+
+
+def _kind(values: pa.Array):
+    """
+    Narrowest kind every (non-null) value of a text column parses as,
+    judged by the same Arrow casts the cache build uses. Returns
+    (kind, values as floats for numeric kinds else the text).
+    """
+    for kind, arrow_type in (("int", pa.int64()), ("float", pa.float64())):
+        parsed = _cast(values, arrow_type)
+        if parsed is not None:
+            return kind, parsed.cast(pa.float64())
+    if pc.all(pc.is_in(pc.utf8_lower(values), value_set=pa.array(BOOL_VALUES))).as_py():
+        return "bool", values
+    return "string", values
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """
+    splitmix64 finalizer: spreads hashes uniformly over 64 bits.
+    """
+    with np.errstate(over="ignore"):
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+
+def _hash64(values: pa.Array) -> np.ndarray:
+    """
+    64-bit hashes of a float64 or string array, computed with NumPy on
+    Arrow's buffers (no Python objects, so the GIL is mostly released).
+    """
+    if pa.types.is_floating(values.type):
+        return _mix(values.to_numpy(zero_copy_only=False).view(np.uint64))
+
+    values = values.cast(pa.large_string())
+    offsets = np.frombuffer(
+        values.buffers()[1], dtype=np.int64, count=len(values) + 1, offset=values.offset * 8
+    )
+    data = np.frombuffer(values.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+    starts = offsets[:-1] - offsets[0]
+    lengths = np.diff(offsets)
+
+    # polynomial hash per string: sum of (byte + 1) * P^position
+    position = np.arange(len(data), dtype=np.uint64) - np.repeat(starts, lengths).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        terms = (data.astype(np.uint64) + np.uint64(1)) * np.power(
+            np.uint64(0x100000001B3), position
+        )
+    sums = np.add.reduceat(np.append(terms, np.uint64(0)), np.minimum(starts, len(data)))
+    sums[lengths == 0] = 0
+    return _mix(sums ^ lengths.astype(np.uint64))
+
+
+class _DistinctSketch:
+    """
+    K-minimum-values sketch: exact below SKETCH_SIZE distinct values,
+    an estimate within a few percent above it, O(SKETCH_SIZE) memory either way.
+    """
+
+    def __init__(self, k=SKETCH_SIZE):
+        self.k = k
+        self._mins = np.empty(0, dtype=np.uint64)
+
+    def add(self, values: pa.Array):
+        # distinct within the batch, so its k smallest are all that can matter
+        hashes = _hash64(pc.unique(values))
+        if len(hashes) > self.k:
+            hashes = np.partition(hashes, self.k - 1)[:self.k]
+        self._mins = np.unique(np.concatenate([self._mins, hashes]))[:self.k]
+
+    def estimate(self) -> int:
+        if len(self._mins) < self.k:
+            return len(self._mins)
+        kth = int(self._mins[-1])
+        return int((self.k - 1) * _HASH_SPACE / (kth + 1))
+
+
+class _ColumnProfile:
+    __slots__ = ("name", "kind", "nulls", "sketch")
+
+    def __init__(self, name):
+        self.name = name
+        self.kind = None
+        self.nulls = 0
+        self.sketch = _DistinctSketch()
+
+    def add(self, column: pa.Array):
+        self.nulls += column.null_count
+        values = column.drop_null()
+        if len(values) == 0:
+            return
+        if self.kind != "string":
+            kind, values = _kind(values)
+            if kind != self.kind:
+                self.kind = _WIDEN.get((self.kind, kind), "string")
+        self.sketch.add(values)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "dtype": _PANDAS_DTYPES[self.kind],
+            "nulls": self.nulls,
+            "approx_unique": self.sketch.estimate(),
+        }
+
+
+def profile_csv(path: str):
+    """
+    Row count, dtype guesses, null counts and approximate cardinality of
+    a CSV. Arrow parses it in CACHE_BLOCK_BYTES batches of text columns
+    and every statistic is computed per batch with Arrow/NumPy kernels,
+    so memory stays bounded and the GIL is mostly free. Raises
+    pyarrow.ArrowInvalid for files Arrow cannot split into rows.
+    """
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        names = next(csv.reader(f), [])
+    columns = [_ColumnProfile(name) for name in names]
+
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=config.CACHE_BLOCK_BYTES),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=list(NA_VALUES),
+            strings_can_be_null=True,
+        ),
+    )
+    rows = 0
+    for batch in reader:
+        rows += batch.num_rows
+        for col, values in zip(columns, batch.columns):
+            col.add(values)
+
+    return {
+        "rows": rows,
+        "size_bytes": os.path.getsize(path),
+        "columns": [c.to_dict() for c in columns],
+    }
+
+
+def _profile_path(path: str) -> str:
+    return f"{path}.profile.json"
+
+
+def save_profile(path: str, profile: dict):
+    profile = {**profile, "fingerprint": fingerprint(path)}
+    with open(_profile_path(path), "w") as f:
+        json.dump(profile, f, indent=2)
+    return profile
+
+
+def load_profile(path: str):
+    """
+    Stored profile for a dataset, or None if missing or out of date.
+    """
+    profile_path = _profile_path(path)
+    if not os.path.exists(profile_path):
+        return None
+    with open(profile_path, "r") as f:
+        profile = json.load(f)
+    if profile.get("fingerprint") != fingerprint(path):
+        return None
+    return profile
@@ -0,0 +1,83 @@
+import hashlib
+import re
+from datetime import datetime
+
+import orjson
+from fastapi import HTTPException, Request, Response
+
+FIELD = re.compile(r"^\w+(\.\w+)*$")
+
+MAX_PAGE = 1000
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def json_array(texts) -> bytes:
+    """
+    JSON array from already-serialized JSON documents, without decoding them.
+    """
+    return b"[" + b",".join(t.encode() for t in texts) + b"]"
+
+
+def parse_fields(fields):
+    """
+    "dataset,tool,metrics.accuracy" -> list, or None for whole entries.
+    """
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    for name in names:
+        if not FIELD.match(name):
+            raise HTTPException(status_code=400, detail=f"Invalid field: {name}")
+    return names or None
+
+
+def parse_time(value):
+    """
+    Unix timestamp or ISO date/datetime -> timestamp.
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+
+def parse_cursor(cursor):
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page(rows, limit):
+    """
+    Split a limit+1 fetch into (rows, next_cursor).
+    """
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, str(rows[-1][0])
+    return rows, None
+
+
+def cached_json(request: Request, key, build):
+    """
+    JSON response with an ETag derived from `key` (the registry version
+    plus the query); a matching If-None-Match gets 304 without calling
+    build(), which returns the body bytes.
+    """
+    etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=build(), media_type="application/json", headers=headers)
@@ -1,24 +1,106 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from .logger import setup_logger
 
 log = setup_logger("SPLIT")
 
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
 
-def _drop_leakage_columns(df: pd.DataFrame):
-    drop_cols = []
-    for c in df.columns:
-        if c.lower() in ["id", "index", "uid"]:
-            drop_cols.append(c)
-        elif df[c].nunique() == df.shape[0]:
-            drop_cols.append(c)
+LEAKAGE_NAMES = {"id", "index", "uid"}
+# rows sampled first; any repeat in the sample already rules a column out
+LEAKAGE_SAMPLE_ROWS = 10_000
+
+
+def _has_repeats(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Per column: does it contain a repeated value? Hashes every column,
+    then one sort along axis 0 checks all columns at once.
+    """
+    hashes = np.column_stack([
+        pd.util.hash_pandas_object(frame[c], index=False).to_numpy()
+        for c in frame.columns
+    ])
+    hashes.sort(axis=0)
+    return (hashes[1:] == hashes[:-1]).any(axis=0)
+
+
+def detect_leakage_columns(df: pd.DataFrame, target=None, profile=None):
+    """
+    ID-like columns: named id/index/uid, or one distinct value per row.
+    `profile` (from the upload profiler) prunes columns whose estimated
+    cardinality is clearly below the row count without touching the data.
+    """
+    n = df.shape[0]
+    drop = [c for c in df.columns if c != target and str(c).lower() in LEAKAGE_NAMES]
+    candidates = [c for c in df.columns if c != target and c not in drop]
+
+    if profile:
+        approx = {col["name"]: col["approx_unique"] for col in profile.get("columns", [])}
+        candidates = [c for c in candidates if approx.get(str(c), n) >= 0.9 * n]
+
+    if not candidates or n == 0:
+        return drop
+
+    # a column with missing values can never have one distinct value per row
+    has_nulls = df[candidates].isna().any().to_numpy()
+    candidates = [c for c, null in zip(candidates, has_nulls) if not null]
+
+    if candidates and n > LEAKAGE_SAMPLE_ROWS:
+        sample = df[candidates].sample(LEAKAGE_SAMPLE_ROWS, random_state=0)
+        candidates = [c for c, rep in zip(candidates, _has_repeats(sample)) if not rep]
+
+    if candidates:
+        drop += [c for c, rep in zip(candidates, _has_repeats(df[candidates])) if not rep]
+
+    return drop
+
+
+def _drop_leakage_columns(df: pd.DataFrame, target=None):
+    drop_cols = detect_leakage_columns(df, target)
     return df.drop(columns=drop_cols), drop_cols
 
 
+def split_indices(y, task: str):
+    """
+    Row positions of the train/test split; same rows split_data picks.
+    """
+    stratify = y if task == "classification" else None
+    return train_test_split(
+        np.arange(len(y)),
+        test_size=TEST_SIZE,
+        random_state=RANDOM_STATE,
+        stratify=stratify
+    )
+
+
+def sample_indices(y, task: str, fraction: float):
+    """
+    Sorted row positions of a `fraction` sample of y, stratified the
+    same way as the train/test split.
+    """
+    positions = np.arange(len(y))
+    if fraction >= 1:
+        return positions
+
+    try:
+        sample, _ = train_test_split(
+            positions,
+            train_size=fraction,
+            random_state=RANDOM_STATE,
+            stratify=y if task == "classification" else None
+        )
+    except ValueError:
+        # too few rows of some class to stratify this small a sample
+        sample, _ = train_test_split(positions, train_size=fraction, random_state=RANDOM_STATE)
+    return np.sort(sample)
+
+
 def split_data(df: pd.DataFrame, target: str, task: str):
     log.info("Starting train-test split")
 
-    df, dropped = _drop_leakage_columns(df)
+    df, dropped = _drop_leakage_columns(df, target)
     if dropped:
         log.warning(f"Dropped leakage columns: {dropped}")
 
@@ -30,8 +112,8 @@ def split_data(df: pd.DataFrame, target: str, task: str):
     X_train, X_test, y_train, y_test = train_test_split(
         X,
         y,
-        test_size=0.2,
-        random_state=42,
+        test_size=TEST_SIZE,
+        random_state=RANDOM_STATE,
         stratify=stratify
     )
 
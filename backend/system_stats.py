@@ -1,8 +1,14 @@
 import platform
 import psutil
+import threading
 import time
+from collections import deque
+
+from backend import config
 
 _START_TIME = time.time()
+_GB = 1024 ** 3
+_MB = 1024 ** 2
 
 def get_system_info():
     return {
@@ -13,25 +19,192 @@ def get_system_info():
         "ram_total_gb": round(psutil.virtual_memory().total / (1024**3), 2),
     }
 
-def monitor_start():
+
+class ResourceSampler:
+    """
+    Background thread that samples CPU, RSS and I/O of this process and
+    every descendant (H2O's JVM, TPOT/AutoGluon workers) for the whole
+    run. Samples go into a fixed-size ring buffer; peaks are kept apart.
+    """
+
+    def __init__(self, interval=None, capacity=None, on_sample=None):
+        self.interval = interval or config.SAMPLER_INTERVAL_SEC
+        self.on_sample = on_sample
+        # (t_sec, cpu_percent, rss_bytes, read_bytes, write_bytes)
+        self.samples = deque(maxlen=capacity or config.SAMPLER_CAPACITY)
+        self.cpu_peak = 0.0
+        self.rss_peak = 0
+        self._root = psutil.Process()
+        self._procs = {}
+        # per-pid I/O counters are cumulative since each process started:
+        # pids alive at the first sample count from their value then, pids
+        # that appear later from 0. A dead pid keeps its last growth only
+        # if its parent is gone too; otherwise the kernel has added its
+        # I/O to the parent's counters when reaping it
+        self._io_base = None
+        self._io = {}
+        self._parents = {}
+        self._cpus = psutil.cpu_count() or 1
+        # RSS peaks of open watch() windows, by key
+        self._windows = {}
+        # sample() runs on the sampler thread and on callers' threads
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+        return self.summary()
+
+    def _loop(self):
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def _tree(self):
+        try:
+            live = [self._root] + self._root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            live = [self._root]
+
+        # reuse Process objects so cpu_percent() measures since last sample
+        procs = {}
+        for p in live:
+            procs[p.pid] = self._procs.get(p.pid, p)
+        self._procs = procs
+        return procs.values()
+
+    def watch(self):
+        """
+        Open a window that follows the tree's peak RSS from now on.
+        Returns (key, current RSS); close it with unwatch(key).
+        """
+        rss = self.sample()[2]
+        with self._lock:
+            key = object()
+            self._windows[key] = rss
+        return key, rss
+
+    def unwatch(self, key):
+        """
+        Close a watch() window and return its peak RSS in bytes.
+        """
+        self.sample()
+        with self._lock:
+            return self._windows.pop(key)
+
+    def sample(self):
+        with self._lock:
+            return self._sample()
+
+    def _sample(self):
+        cpu = 0.0
+        rss = 0
+        first = self._io_base is None
+        if first:
+            self._io_base = {}
+
+        for p in self._tree():
+            try:
+                with p.oneshot():
+                    cpu += p.cpu_percent(interval=None)
+                    rss += p.memory_info().rss
+                    if hasattr(p, "io_counters"):
+                        io = p.io_counters()
+                        base = self._io_base.setdefault(
+                            p.pid, (io.read_bytes, io.write_bytes) if first else (0, 0)
+                        )
+                        self._io[p.pid] = (io.read_bytes - base[0], io.write_bytes - base[1])
+                        self._parents[p.pid] = p.ppid()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        live = self._procs.keys()
+        for pid in [pid for pid in self._io if pid not in live]:
+            if self._parents.pop(pid, None) in live:
+                del self._io[pid]
+
+        read = sum(r for r, _ in self._io.values())
+        write = sum(w for _, w in self._io.values())
+
+        # share of the whole host, comparable to psutil.cpu_percent()
+        cpu = min(100.0, cpu / self._cpus)
+        t = time.perf_counter() - self._start
+
+        point = (round(t, 2), round(cpu, 1), rss, read, write)
+        self.samples.append(point)
+        self.cpu_peak = max(self.cpu_peak, cpu)
+        self.rss_peak = max(self.rss_peak, rss)
+        for key, peak in self._windows.items():
+            self._windows[key] = max(peak, rss)
+
+        if self.on_sample is not None:
+            self.on_sample(_as_dict(point))
+        return point
+
+    def summary(self, points=None):
+        samples = list(self.samples)
+        last = samples[-1] if samples else (0, 0, 0, 0, 0)
+        return {
+            "train_time_sec": round(time.perf_counter() - self._start, 2),
+            "cpu_peak_percent": round(self.cpu_peak, 2),
+            "ram_peak_gb": round(self.rss_peak / _GB, 2),
+            "io_read_mb": round(last[3] / _MB, 1),
+            "io_write_mb": round(last[4] / _MB, 1),
+            "timeseries": downsample(samples, points or config.TIMESERIES_POINTS),
+        }
+
+
+def _as_dict(point):
+    t, cpu, rss, read, write = point
     return {
-        "start_time": time.perf_counter(),
-        "cpu_peak": 0.0,
-        "ram_peak": 0.0
+        "t": t,
+        "cpu_percent": cpu,
+        "rss_gb": round(rss / _GB, 3),
+        "read_mb": round(read / _MB, 1),
+        "write_mb": round(write / _MB, 1),
     }
 
+
+def downsample(samples, points):
+    """
+    Reduce samples to at most `points` buckets as column lists, keeping
+    each bucket's max CPU/RSS so short spikes stay visible.
+    """
+    series = {"t": [], "cpu_percent": [], "rss_gb": [], "read_mb": [], "write_mb": []}
+    if not samples:
+        return series
+
+    step = max(1, -(-len(samples) // points))
+    for i in range(0, len(samples), step):
+        bucket = samples[i:i + step]
+        last = bucket[-1]
+        series["t"].append(last[0])
+        series["cpu_percent"].append(max(s[1] for s in bucket))
+        series["rss_gb"].append(round(max(s[2] for s in bucket) / _GB, 3))
+        series["read_mb"].append(round(last[3] / _MB, 1))
+        series["write_mb"].append(round(last[4] / _MB, 1))
+    return series
+
+
+def monitor_start(on_sample=None):
+    return ResourceSampler(on_sample=on_sample).start()
+
 def monitor_tick(m):
-    cpu = psutil.cpu_percent(interval=None)
-    ram = psutil.virtual_memory().used / (1024**3)
-    m["cpu_peak"] = max(m["cpu_peak"], cpu)
-    m["ram_peak"] = max(m["ram_peak"], ram)
+    m.sample()
 
 def monitor_end(m):
-    return {
-        "train_time_sec": round(time.perf_counter() - m["start_time"], 2),
-        "cpu_peak_percent": round(m["cpu_peak"], 2),
-        "ram_peak_gb": round(m["ram_peak"], 2)
-    }
+    return m.stop()
 
 def get_system_stats():
     vm = psutil.virtual_memory()
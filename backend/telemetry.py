@@ -0,0 +1,159 @@
+import asyncio
+import contextlib
+import json
+from collections import deque
+
+from fastapi import WebSocketDisconnect
+
+from backend import config
+from backend.system_stats import get_system_stats
+from .logger import setup_logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+log = setup_logger("TELEMETRY")
+
+# frames where only the newest value matters (per engine)
+COALESCED = ("system_stats", "run_stats", "progress")
+
+
+def choose_encoding(requested):
+    """
+    "msgpack" (binary frames) when asked for and installed, else "json".
+    """
+    return "msgpack" if requested == "msgpack" and msgpack is not None else "json"
+
+
+class Channel:
+    """
+    Outbound side of one WebSocket. Log lines are batched into "logs"
+    frames and stats-like frames keep only their newest value, so a slow
+    client holds bounded memory instead of stalling the run. One writer
+    task flushes them at most every TELEMETRY_FLUSH_SEC; other frames
+    (job, result, done) go out in order, right away.
+    """
+
+    def __init__(self, websocket, encoding="json"):
+        self.websocket = websocket
+        self.encoding = encoding
+        self._logs = deque(maxlen=config.TELEMETRY_LOG_BUFFER)
+        self._dropped = 0
+        self._latest = {}
+        self._ordered = deque()
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._failed = False
+        self._writer = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._run())
+
+    def send(self, msg):
+        """
+        Queue a frame; raises WebSocketDisconnect once the client is gone.
+        """
+        if self._failed:
+            raise WebSocketDisconnect()
+        self.offer(msg)
+
+    def offer(self, msg):
+        kind = msg.get("type")
+        if kind == "log":
+            if len(self._logs) == self._logs.maxlen:
+                self._dropped += 1
+            self._logs.append({k: v for k, v in msg.items() if k != "type"})
+        elif kind in COALESCED:
+            self._latest[(kind, msg.get("engine"))] = msg
+        else:
+            self._ordered.append(msg)
+        self._wake.set()
+
+    def _drain(self):
+        frames = []
+        if self._logs:
+            frames.append({"type": "logs", "lines": list(self._logs), "dropped": self._dropped})
+            self._logs.clear()
+            self._dropped = 0
+        frames.extend(self._latest.values())
+        self._latest.clear()
+        while self._ordered:
+            frames.append(self._ordered.popleft())
+        return frames
+
+    async def _write(self, frame):
+        if self.encoding == "msgpack":
+            await self.websocket.send_bytes(msgpack.packb(frame, default=str))
+        else:
+            await self.websocket.send_text(json.dumps(frame, default=str))
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wake.wait()
+                if not self._ordered and not self._closing:
+                    # let lines and samples pile up into one flush
+                    await asyncio.sleep(config.TELEMETRY_FLUSH_SEC)
+                self._wake.clear()
+
+                for frame in self._drain():
+                    await self._write(frame)
+                if self._closing and not self._wake.is_set():
+                    return
+        except Exception as e:
+            # client disconnected or stalled out; the run carries on
+            log.info(f"Telemetry channel closed: {e!r}")
+            self._failed = True
+
+    async def close(self):
+        self._closing = True
+        self._wake.set()
+        if self._writer is not None:
+            await self._writer
+
+
+class TelemetryHub:
+    """
+    One host-stats sampler per process, broadcast to every connected
+    viewer at a fixed rate. Runs only while someone is subscribed.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._channels = set()
+        self._task = None
+
+    def subscribe(self, channel):
+        self._channels.add(channel)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sample())
+
+    def unsubscribe(self, channel):
+        self._channels.discard(channel)
+        if not self._channels and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            frame = {"type": "system_stats", "data": get_system_stats()}
+            for channel in list(self._channels):
+                channel.offer(frame)
+            await asyncio.sleep(self.interval)
+
+
+hub = TelemetryHub(config.TELEMETRY_INTERVAL_SEC)
+
+
+@contextlib.asynccontextmanager
+async def open_channel(websocket, encoding="json"):
+    channel = Channel(websocket, encoding)
+    channel.start()
+    hub.subscribe(channel)
+    try:
+        yield channel
+    finally:
+        hub.unsubscribe(channel)
+        await channel.close()
@@ -1,19 +1,88 @@
+import io
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import psutil
 from tpot import TPOTClassifier, TPOTRegressor
-from sklearn.metrics import (
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    mean_squared_error,
-    mean_absolute_error,
-    r2_score,
-)
+from backend import config
+from .metrics import score_predictions
 from .logger import setup_logger
+from .tracing import span
 
 log = setup_logger("TPOT")
 
 MIN_ROWS = 50
 
+GENERATION_LINE = re.compile(r"Generation (\d+) - Current best internal CV score: (\S+)")
+
+
+class _GenerationLog(io.TextIOBase):
+    """
+    File-like sink for TPOT's log_file. Picks the per-generation lines
+    out of its progress output as they are written and times them.
+    """
+
+    def __init__(self, on_generation=None):
+        self.on_generation = on_generation
+        self.generations = []
+        self._buffer = ""
+        self._start = self._last = time.perf_counter()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._buffer += text
+        *lines, self._buffer = re.split(r"[\r\n]", self._buffer)
+        for line in lines:
+            match = GENERATION_LINE.search(line)
+            if match:
+                self._record(int(match.group(1)), float(match.group(2)))
+        return len(text)
+
+    def _record(self, generation, score):
+        now = time.perf_counter()
+        record = {
+            "generation": generation,
+            "best_cv_score": round(score, 4),
+            "generation_sec": round(now - self._last, 2),
+            "elapsed_sec": round(now - self._start, 2),
+        }
+        self._last = now
+        self.generations.append(record)
+        if self.on_generation is not None:
+            self.on_generation(record)
+
+
+def search_space(time_limit, n_jobs):
+    """
+    Population grows with the cores so each generation keeps all of them
+    busy; generations follow the budget (max_time_mins still caps the run).
+    """
+    population = max(config.TPOT_MIN_POPULATION, config.TPOT_POPULATION_PER_CORE * n_jobs)
+    generations = int(time_limit * n_jobs / (population * config.TPOT_SEC_PER_PIPELINE))
+    return population, max(2, generations)
+
+
+# TPOT's internal CV scores on these, so its best score maps to the
+# accuracy / rmse the early-stop baseline uses
+SCORING = {"classification": "accuracy", "regression": "neg_mean_squared_error"}
+
+
+def _validation_score(model, task):
+    """
+    Internal CV score of the best pipeline as accuracy / rmse.
+    """
+    score = getattr(model, "_optimized_pipeline_score", None)
+    if score is None:
+        return None
+    return float(score) if task == "classification" else float(np.sqrt(-score))
+
 
 def run_tpot(
     X_train,
@@ -21,57 +90,81 @@ def run_tpot(
     y_train,
     y_test,
     task: str,
-    time_limit: int = 120
+    time_limit: int = 120,
+    resources=None,
+    early_stop=None,
+    artifact_dir=None,
+    on_progress=None
 ):
     if X_train.shape[0] < MIN_ROWS:
         return {"skipped": True, "reason": "Dataset too small"}
 
     log.info("TPOT training started")
 
-    if task == "classification":
-        model = TPOTClassifier(
-            generations=2,
-            population_size=10,
-            max_time_mins=time_limit / 60,
-            random_state=42,
-            n_jobs=1,
-            verbosity=0
-        )
-    else:
-        model = TPOTRegressor(
-            generations=2,
-            population_size=10,
-            max_time_mins=time_limit / 60,
-            random_state=42,
-            n_jobs=1,
-            verbosity=0
-        )
-
-    model.fit(X_train, y_train)
-    preds = model.predict(X_test)
-
-    if task == "classification":
-        acc = float(accuracy_score(y_test, preds))
-        prec = float(precision_score(y_test, preds, average="weighted", zero_division=0))
-        rec = float(recall_score(y_test, preds, average="weighted", zero_division=0))
-        f1 = float(f1_score(y_test, preds, average="weighted", zero_division=0))
-
-        metrics = {
-            "accuracy": round(acc, 4),
-            "precision_weighted": round(prec, 4),
-            "recall_weighted": round(rec, 4),
-            "f1_weighted": round(f1, 4),
-        }
-    else:
-        rmse = float(mean_squared_error(y_test, preds, squared=False))
-        mae = float(mean_absolute_error(y_test, preds))
-        r2 = float(r2_score(y_test, preds))
-
-        metrics = {
-            "rmse": round(rmse, 4),
-            "mae": round(mae, 4),
-            "r2": round(r2, 4),
-        }
+    n_jobs = resources["cpus"] if resources else psutil.cpu_count() or 1
+    first, rest = early_stop.phases(time_limit) if early_stop else (time_limit, 0)
+    population, generations = search_space(first, n_jobs)
+    log.info(f"TPOT: {n_jobs} jobs, population {population}, up to {generations} generations")
+
+    def on_generation(record):
+        if on_progress:
+            # the initial population plus one set of offspring per generation
+            on_progress({
+                "models_trained": population * (record["generation"] + 1),
+                "best_score": record["best_cv_score"],
+                "score_name": "cv_score",
+                "generation": record["generation"],
+                "generation_sec": record["generation_sec"],
+            })
+
+    generation_log = _GenerationLog(on_generation)
+
+    # best pipeline so far is exported here periodically, so a run that
+    # is killed before fit returns still leaves its best pipeline behind
+    os.makedirs(config.TPOT_CHECKPOINT_DIR, exist_ok=True)
+    checkpoint_dir = tempfile.mkdtemp(prefix="tpot_", dir=config.TPOT_CHECKPOINT_DIR)
+
+    estimator = TPOTClassifier if task == "classification" else TPOTRegressor
+    model = estimator(
+        generations=generations,
+        population_size=population,
+        max_time_mins=first / 60,
+        random_state=42,
+        scoring=SCORING[task],
+        n_jobs=n_jobs,
+        warm_start=True,
+        periodic_checkpoint_folder=checkpoint_dir,
+        log_file=generation_log,
+        verbosity=2
+    )
+
+    try:
+        model.fit(X_train, y_train)
+    except BaseException:
+        log.error(f"TPOT failed, best pipelines so far kept in {checkpoint_dir}")
+        raise
+
+    stop_report = None
+    if early_stop:
+        interim = _validation_score(model, task)
+        stopped = early_stop.should_stop(interim)
+        stop_report = early_stop.report(time_limit, stopped, interim=interim)
+        if stopped:
+            log.info(f"TPOT did not beat the baseline, stopping after {first}s")
+        elif rest:
+            # warm_start continues evolving the population from phase one
+            model.max_time_mins = rest / 60
+            model.generations = search_space(rest, n_jobs)[1]
+            model.fit(X_train, y_train)
+
+    metrics = score_predictions(task, y_test, model.predict(X_test))
+
+    # finished cleanly: the saved model supersedes the checkpoints
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    if artifact_dir:
+        with span("persist"), open(os.path.join(artifact_dir, "model.pkl"), "wb") as f:
+            pickle.dump(model.fitted_pipeline_, f)
 
     return {
         "skipped": False,
@@ -82,5 +175,21 @@ def run_tpot(
                 "model_id": "TPOT_Best_Pipeline",
                 **metrics
             }
-        ]
+        ],
+        "validation_score": _validation_score(model, task),
+        "early_stop": stop_report,
+        "details": {
+            "n_jobs": n_jobs,
+            "population_size": population,
+            "generations": generation_log.generations,
+        }
     }
+
+
+def load_model(artifact_dir):
+    with open(os.path.join(artifact_dir, "model.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+def predict_model(model, X):
+    return model.predict(X)
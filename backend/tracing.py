@@ -0,0 +1,142 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+
+import psutil
+
+from backend import config
+from backend.system_stats import ResourceSampler
+
+_MB = 1024 ** 2
+
+# spans recorder of the run executing in this thread / process, if any
+_current = contextvars.ContextVar("spans", default=None)
+
+
+def _cpu_seconds():
+    """
+    CPU time of this process, its finished children and its live
+    descendants (H2O's JVM, joblib workers).
+    """
+    proc = psutil.Process()
+    times = proc.cpu_times()
+    total = times.user + times.system + times.children_user + times.children_system
+    try:
+        children = proc.children(recursive=True)
+    except psutil.NoSuchProcess:
+        children = []
+    for child in children:
+        try:
+            t = child.cpu_times()
+            total += t.user + t.system
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+
+class Spans:
+    """
+    Wall time, CPU time and peak-RSS growth of the named stages of a run.
+    RSS is the whole process tree's, as sampled by `sampler` during the
+    stage. Repeated stages under the same parent are merged into one span.
+    """
+
+    def __init__(self, sampler):
+        self._sampler = sampler
+        self._spans = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def span(self, name):
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        window, rss = self._sampler.watch()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            record = self._spans.setdefault((parent, name), {
+                "name": name,
+                "parent": parent,
+                "calls": 0,
+                "wall_sec": 0.0,
+                "cpu_sec": 0.0,
+                "peak_rss_delta_mb": 0.0,
+            })
+            record["calls"] += 1
+            record["wall_sec"] += time.perf_counter() - wall
+            record["cpu_sec"] += _cpu_seconds() - cpu
+            record["peak_rss_delta_mb"] += (self._sampler.unwatch(window) - rss) / _MB
+
+    def summary(self):
+        return [
+            {
+                **s,
+                "wall_sec": round(s["wall_sec"], 3),
+                "cpu_sec": round(s["cpu_sec"], 3),
+                "peak_rss_delta_mb": round(s["peak_rss_delta_mb"], 1),
+            }
+            for s in self._spans.values()
+        ]
+
+
+@contextlib.contextmanager
+def recording():
+    """
+    Collect the spans opened with span() in this context.
+    """
+    sampler = ResourceSampler(interval=config.SPAN_SAMPLER_INTERVAL_SEC, capacity=1).start()
+    spans = Spans(sampler)
+    token = _current.set(spans)
+    try:
+        yield spans
+    finally:
+        _current.reset(token)
+        sampler.stop()
+
+
+def span(name):
+    """
+    Time a stage of the active recording; a no-op outside of one.
+    """
+    spans = _current.get()
+    return spans.span(name) if spans is not None else contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def capture_profile(path, enabled=True):
+    """
+    cProfile the calling thread and dump the stats to `path`.
+    """
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def top_functions(path, limit=30):
+    """
+    Hottest functions of a dumped profile by cumulative time.
+    """
+    stats = pstats.Stats(path, stream=io.StringIO())
+    rows = []
+    for (file, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{file}:{line}({func})",
+            "calls": calls,
+            "tottime_sec": round(tottime, 4),
+            "cumtime_sec": round(cumtime, 4),
+        })
+    rows.sort(key=lambda r: r["cumtime_sec"], reverse=True)
+    return rows[:limit]
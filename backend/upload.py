@@ -1,26 +1,110 @@
+import asyncio
 import os
-from fastapi import UploadFile
+import uuid
+import pyarrow as pa
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+from backend import config
 from backend.logger import setup_logger
+from backend.profiler import profile_csv, save_profile
 
 DATASET_DIR = "datasets"
 
+# multipart framing allowed on top of MAX_UPLOAD_BYTES of file content
+MULTIPART_OVERHEAD = 64 * 1024
+
 log = setup_logger("UPLOAD")
 
 
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload exceeds {config.MAX_UPLOAD_BYTES} bytes"
+    )
+
+
+class UploadLimit:
+    """
+    ASGI middleware that refuses oversized uploads before the multipart
+    parser spools them to disk: by Content-Length up front, or as soon
+    as a body without one grows past the limit.
+    """
+
+    def __init__(self, app, path="/upload"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        limit = config.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            error = _too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing
+                    raise _too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
 async def upload_dataset(file: UploadFile):
     os.makedirs(DATASET_DIR, exist_ok=True)
 
-    file_path = os.path.join(DATASET_DIR, file.filename)
+    filename = os.path.basename(file.filename)
+    file_path = os.path.join(DATASET_DIR, filename)
+    tmp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.part"
+
+    log.info(f"Uploading file: {filename}")
+
+    size = 0
+
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = await file.read(config.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > config.MAX_UPLOAD_BYTES:
+                    raise _too_large()
+
+                await asyncio.to_thread(f.write, chunk)
+
+        os.replace(tmp_path, file_path)
 
-    log.info(f"Uploading file: {file.filename}")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    content = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # Arrow parses and profiles off the event loop, mostly without the GIL
+    try:
+        profile = save_profile(file_path, await asyncio.to_thread(profile_csv, file_path))
+        rows = profile["rows"]
+    except pa.ArrowInvalid as e:
+        log.warning(f"Could not profile {filename}: {e}")
+        profile, rows = None, "?"
 
-    log.info(f"Saved dataset to {file_path}")
+    log.info(f"Saved dataset to {file_path} ({size} bytes, {rows} rows)")
 
     return {
         "success": True,
-        "filename": file.filename
+        "filename": filename,
+        "profile": profile
     }
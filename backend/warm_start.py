@@ -0,0 +1,90 @@
+import numpy as np
+
+from backend import config
+from backend.compare.registry import load_flaml_configs, save_flaml_configs
+from .logger import setup_logger
+
+log = setup_logger("WARMSTART")
+
+# order of the meta-feature vector used for distances
+META_FEATURES = (
+    "log_rows",
+    "log_features",
+    "categorical_fraction",
+    "log_classes",
+    "class_entropy",
+    "minority_share",
+)
+
+
+def meta_features(prep) -> dict:
+    """
+    Cheap description of a dataset: size, dtype mix and class balance.
+    """
+    meta = prep.meta
+    n_features = len(meta["features"])
+    features = {
+        "log_rows": float(np.log10(max(prep.n_train, 1))),
+        "log_features": float(np.log10(max(n_features, 1))),
+        "categorical_fraction": len(meta["categories"]) / n_features if n_features else 0.0,
+        "log_classes": 0.0,
+        "class_entropy": 0.0,
+        "minority_share": 0.0,
+    }
+
+    if prep.task == "classification":
+        counts = prep.class_counts()
+        share = counts[counts > 0] / counts.sum()
+        features["log_classes"] = float(np.log2(len(share)))
+        features["minority_share"] = float(share.min())
+        if len(share) > 1:
+            # normalised to 1.0 for perfectly balanced classes
+            features["class_entropy"] = float(-(share * np.log2(share)).sum() / np.log2(len(share)))
+
+    return features
+
+
+def _vector(features):
+    return np.array([features.get(name, 0.0) for name in META_FEATURES])
+
+
+def starting_points(prep, k=config.FLAML_WARM_START_K):
+    """
+    Best configs of the k stored datasets nearest in meta-feature space,
+    merged per estimator (nearest first). Returns (points, neighbours);
+    points is None when nothing is stored for the task.
+    """
+    stored = load_flaml_configs(prep.task)
+    if not stored:
+        return None, []
+
+    target = _vector(meta_features(prep))
+    vectors = np.array([_vector(s["features"]) for s in stored])
+
+    # scale every meta-feature by its spread so no single one dominates
+    scale = vectors.std(axis=0)
+    scale[scale == 0] = 1.0
+    distance = np.linalg.norm((vectors - target) / scale, axis=1)
+    nearest = np.argsort(distance)[:k]
+
+    points = {}
+    for i in nearest:
+        for estimator, cfg in stored[i]["configs"].items():
+            if cfg and cfg not in points.setdefault(estimator, []):
+                points[estimator].append(cfg)
+
+    neighbours = [
+        {"dataset": stored[i]["dataset"], "distance": round(float(distance[i]), 3)}
+        for i in nearest
+    ]
+    return points, neighbours
+
+
+def remember(prep, dataset, configs, score):
+    if not configs:
+        return
+    save_flaml_configs(
+        dataset, prep.task, meta_features(prep), configs, score,
+        config.FLAML_WARM_START_MAX_ENTRIES
+    )
+    log.info(f"Stored FLAML configs of {dataset} for warm starts")
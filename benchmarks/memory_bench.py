@@ -0,0 +1,138 @@
+"""
+Memory cost of handing train/test data to an engine, before and after
+the memory-mapped preprocessing stage.
+
+"copy" reproduces the old hand-off (load, split_data, then X.copy() plus
+the target column for each frame); "mmap" opens the cached stage and
+builds frames and arrays from memory-mapped files. Each mode runs in a
+fresh interpreter on the same synthetic dataset and touches every
+column, as an engine would.
+
+Peak RSS includes file-backed pages, which live in the page cache and
+are shared by every worker mapping the same files; anon is the heap
+memory each worker holds privately (RssAnon).
+
+    python benchmarks/memory_bench.py [--rows 500000] [--cols 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHILD = """
+import json, resource, sys
+sys.path.insert(0, {root!r})
+import numpy as np, pandas as pd
+
+def anon():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+
+{imports}
+base_peak, base_anon = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, anon()
+{body}
+for frame in frames:
+    for c in frame.columns:
+        if pd.api.types.is_numeric_dtype(frame[c]):
+            frame[c].sum()
+for array in arrays:
+    if array.dtype.kind == "f":
+        array.sum()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+print(json.dumps({{"peak_mb": (peak - base_peak) / 1024 ** 2, "anon_mb": (anon() - base_anon) / 1024 ** 2}}))
+"""
+
+MODES = {
+    "copy (before)": (
+        """
+from backend.data_loader import load_dataset
+from backend.splitter import split_data
+from backend.task_detector import detect_task
+""",
+        """
+df = load_dataset("datasets/bench.csv")
+task, target = detect_task(df)
+X_train, X_test, y_train, y_test = split_data(df, target, task)
+train_df = X_train.copy()
+train_df[target] = y_train
+test_df = X_test.copy()
+test_df[target] = y_test
+frames = [train_df, test_df]
+arrays = []
+""",
+    ),
+    "mmap (after)": (
+        "from backend.preprocess import prepare",
+        """
+prep = prepare("datasets/bench.csv")
+frames = list(prep.frames())
+arrays = list(prep.arrays())
+""",
+    ),
+}
+
+
+def _write_dataset(workdir, rows, cols):
+    rng = np.random.default_rng(0)
+    # rounded so no feature is unique per row (and dropped as an ID)
+    values = rng.normal(size=(rows, cols)).round(2)
+    df = pd.DataFrame(values, columns=[f"f{i}" for i in range(cols)])
+    df["cat"] = rng.choice(["a", "b", "c", "d"], rows)
+    df["target"] = rng.choice(["yes", "no"], rows)
+    os.makedirs(os.path.join(workdir, "datasets"))
+    path = os.path.join(workdir, "datasets", "bench.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def _run(workdir, imports, body):
+    code = CHILD.format(root=ROOT, imports=imports, body=body)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--cols", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="memory_bench_") as workdir:
+        path = _write_dataset(workdir, args.rows, args.cols)
+        print(f"dataset: {args.rows} rows x {args.cols + 2} cols, "
+              f"{os.path.getsize(path) / 1024 ** 2:.1f} MB CSV")
+
+        # build the Arrow cache and preprocessing stage outside the timed
+        # children, as the upload and the first run would
+        _run(workdir, *MODES["mmap (after)"])
+
+        print(f"{'mode':<16} {'peak MB':>10} {'anon MB':>10}")
+        results = {}
+        for mode, (imports, body) in MODES.items():
+            results[mode] = _run(workdir, imports, body)
+            print(f"{mode:<16} {results[mode]['peak_mb']:>10.1f} {results[mode]['anon_mb']:>10.1f}")
+
+    before, after = results["copy (before)"], results["mmap (after)"]
+    print(
+        f"saved: {before['peak_mb'] - after['peak_mb']:.1f} MB peak, "
+        f"{before['anon_mb'] - after['anon_mb']:.1f} MB private per worker"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start cost of the API process, before and after lazy engine imports.
+
+"eager" reproduces the old behaviour (every installed runner imported
+together with backend.app); "lazy" imports backend.app alone, as uvicorn
+does now. Each mode runs in a fresh interpreter several times.
+
+    python benchmarks/startup_bench.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.engines import ENGINES, available_engines  # noqa: E402
+
+CHILD = """
+import json, time
+t0 = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - t0
+import psutil
+rss = psutil.Process().memory_info().rss
+print(json.dumps({{"sec": elapsed, "rss_mb": rss / 1024 ** 2}}))
+"""
+
+
+def _measure(imports, repeat):
+    code = CHILD.format(imports="\n".join(imports))
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "sec": statistics.median(s["sec"] for s in samples),
+        "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    installed = [name for name, ok in available_engines().items() if ok]
+    runner_imports = [f"import {ENGINES[name][0]}" for name in installed]
+
+    modes = {
+        "eager (before)": runner_imports + ["import backend.app"],
+        "lazy (after)": ["import backend.app"],
+    }
+
+    print(f"engines installed: {', '.join(installed) or 'none'}")
+    print(f"{'mode':<16} {'import sec':>10} {'rss MB':>10}")
+    results = {}
+    for mode, imports in modes.items():
+        results[mode] = _measure(imports, args.repeat)
+        print(f"{mode:<16} {results[mode]['sec']:>10.2f} {results[mode]['rss_mb']:>10.1f}")
+
+    before, after = results["eager (before)"], results["lazy (after)"]
+    print(
+        f"saved: {before['sec'] - after['sec']:.2f}s, "
+        f"{before['rss_mb'] - after['rss_mb']:.1f} MB RSS"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -68,6 +68,16 @@ export default function H2OPage({ setLastResult }) {
         setLogMessages((prev) => [...prev, msg.message]);
       }
 
+      if (msg.type === "logs") {
+        const lines = msg.lines.map((l) =>
+          l.engine ? `[${l.engine}] ${l.message}` : l.message
+        );
+        if (msg.dropped) {
+          lines.unshift(`[${msg.dropped} log lines skipped]`);
+        }
+        setLogMessages((prev) => [...prev, ...lines]);
+      }
+
       if (msg.type === "system_info") {
         setSystemInfo(msg.data);
       }